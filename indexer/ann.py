@@ -0,0 +1,222 @@
+import time
+
+import numpy as np
+from config import ANN_NPROBE
+from search import DEFAULT_RELEVANCE_THRESHOLD, SearchIndex, sample_queries
+
+# Rows scored per matrix product while assigning rows to lists
+ASSIGN_BLOCK_SIZE = 4096
+
+
+def assign_to_centroids(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Return the index of the most similar centroid for every row."""
+    assignments = np.empty(len(embeddings), dtype=np.int64)
+    for i in range(0, len(embeddings), ASSIGN_BLOCK_SIZE):
+        block = np.asarray(embeddings[i : i + ASSIGN_BLOCK_SIZE], dtype=np.float32)
+        assignments[i : i + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(
+    embeddings: np.ndarray,
+    nlist: int,
+    iterations: int = 10,
+    train_size: int = 50_000,
+    seed: int = 0,
+) -> np.ndarray:
+    """Cluster the rows with spherical k-means and return unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    sample_rows = rng.choice(
+        len(embeddings), min(len(embeddings), train_size), replace=False
+    )
+    sample = np.asarray(embeddings[np.sort(sample_rows)], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign_to_centroids(sample, centroids)
+
+        order = np.argsort(assignments, kind="stable")
+        sorted_assignments = assignments[order]
+        starts = np.flatnonzero(
+            np.r_[True, sorted_assignments[1:] != sorted_assignments[:-1]]
+        )
+        sums = np.add.reduceat(sample[order], starts, axis=0)
+
+        # Lists that lost all their rows get restarted from a random row
+        new_centroids = sample[rng.choice(len(sample), nlist)].copy()
+        new_centroids[sorted_assignments[starts]] = sums
+        norms = np.linalg.norm(new_centroids, axis=1, keepdims=True)
+        centroids = new_centroids / np.maximum(norms, 1e-12)
+
+    return centroids.astype(np.float32)
+
+
+def build_ivf(
+    embeddings: np.ndarray, nlist: int | None = None, seed: int = 0
+) -> dict[str, np.ndarray]:
+    """Build an IVF-flat index over the embedding rows.
+
+    Returns the arrays to store alongside the index: the list centroids, and the
+    rows of list i as list_rows[list_offsets[i]:list_offsets[i + 1]].
+    """
+    if nlist is None:
+        nlist = max(1, int(2 * np.sqrt(len(embeddings))))
+    nlist = min(nlist, len(embeddings))
+
+    centroids = train_centroids(embeddings, nlist, seed=seed)
+    assignments = assign_to_centroids(embeddings, centroids)
+
+    list_rows = np.argsort(assignments, kind="stable").astype(np.int64)
+    list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignments, minlength=nlist), out=list_offsets[1:])
+
+    return {
+        "ann_centroids": centroids,
+        "ann_list_offsets": list_offsets,
+        "ann_list_rows": list_rows,
+    }
+
+
+class IVFIndex:
+    """Approximate search that only scores the rows in the nprobe lists closest to the query.
+
+    A document's relevance is still the max over its scored rows, with each document
+    returned at most once no matter how many of its rows were hit. Rows outside the
+    probed lists are skipped, so a document's relevance can be underestimated.
+    """
+
+    def __init__(
+        self,
+        index: SearchIndex,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_rows: np.ndarray,
+    ):
+        self.index = index
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.list_offsets = np.asarray(list_offsets, dtype=np.int64)
+        self.list_rows = np.asarray(list_rows, dtype=np.int64)
+
+    @classmethod
+    def from_arrays(cls, index: SearchIndex, arrays: dict[str, np.ndarray]):
+        return cls(
+            index,
+            arrays["ann_centroids"],
+            arrays["ann_list_offsets"],
+            arrays["ann_list_rows"],
+        )
+
+    def search_ids(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        threshold: float,
+        nprobe: int = ANN_NPROBE,
+    ) -> list[tuple[int, float]]:
+        """Return (document, relevance) of the k best documents found, best first."""
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        nprobe = min(nprobe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query_vector), nprobe - 1)[:nprobe]
+        rows = np.concatenate(
+            [
+                self.list_rows[self.list_offsets[probe] : self.list_offsets[probe + 1]]
+                for probe in probes
+            ]
+        )
+        if len(rows) == 0:
+            return []
+
+        scores = self.index.embeddings[rows] @ query_vector
+        documents = self.index.row_documents[rows]
+
+        # Deduplicate documents, keeping the best row of each
+        order = np.argsort(documents, kind="stable")
+        documents = documents[order]
+        starts = np.flatnonzero(np.r_[True, documents[1:] != documents[:-1]])
+        document_scores = np.maximum.reduceat(scores[order], starts)
+        documents = documents[starts]
+
+        candidates = np.flatnonzero(document_scores >= threshold)
+        if len(candidates) > k:
+            best = np.argpartition(-document_scores[candidates], k - 1)[:k]
+            candidates = np.sort(candidates[best])
+        candidates = candidates[np.argsort(-document_scores[candidates], kind="stable")]
+        return [(int(documents[i]), float(document_scores[i])) for i in candidates]
+
+    def search(
+        self,
+        query_vector: list[float] | np.ndarray,
+        k: int = 2,
+        threshold: float = DEFAULT_RELEVANCE_THRESHOLD,
+        nprobe: int = ANN_NPROBE,
+    ) -> list[dict]:
+        """Return the k most relevant documents found, as title, type, content and relevance."""
+        k = max(k, 1)
+        return [
+            dict(self.index.get_document(document), relevance=relevance)
+            for document, relevance in self.search_ids(
+                self.index.project_queries(query_vector), k, threshold, nprobe
+            )
+        ]
+
+
+def load_packed(path: str = "build/index.bin") -> IVFIndex:
+    """Load the IVF index stored in an index.bin, memory-mapping everything."""
+    index = SearchIndex.from_packed(path)
+    return IVFIndex.from_arrays(index, index.arrays)
+
+
+def recall_report(
+    index: SearchIndex,
+    ivf: IVFIndex,
+    k: int = 10,
+    nprobes: tuple[int, ...] = (1, 2, 4, 8, 16, 32),
+    queries: int = 200,
+    seed: int = 0,
+) -> dict:
+    """Measure recall@k and latency of IVF search against exact search.
+
+    Queries are perturbed copies of the index's own embedding rows (see
+    sample_queries), which include the generated questions and summaries and so
+    resemble real queries. No threshold is applied, so recall reflects ranking only.
+    """
+    query_vectors = sample_queries(index.embeddings, queries, seed)
+
+    start = time.perf_counter()
+    exact = [
+        {document for document, _ in index.top_k(index.score_documents(query), k, -1.0)}
+        for query in query_vectors
+    ]
+    exact_latency = (time.perf_counter() - start) / len(query_vectors)
+
+    report = {
+        "k": k,
+        "queries": len(query_vectors),
+        "rows": len(index.embeddings),
+        "lists": len(ivf.centroids),
+        "exact_latency_ms": exact_latency * 1000,
+        "nprobe": [],
+    }
+    for nprobe in nprobes:
+        if nprobe > len(ivf.centroids):
+            break
+        start = time.perf_counter()
+        found = [
+            {document for document, _ in ivf.search_ids(query, k, -1.0, nprobe)}
+            for query in query_vectors
+        ]
+        latency = (time.perf_counter() - start) / len(query_vectors)
+        recall = np.mean(
+            [
+                len(hits & truth) / max(len(truth), 1)
+                for hits, truth in zip(found, exact)
+            ]
+        )
+        report["nprobe"].append(
+            {
+                "nprobe": nprobe,
+                "recall": float(recall),
+                "latency_ms": latency * 1000,
+            }
+        )
+    return report
@@ -1,60 +1,31 @@
 import re  # for cutting metadata out of doc headers
 from json import dumps as json_dumps  # For debug printing
 
-import config
-import requests  # for fetching the docs
+import instrumentation
+import markup  # for cleaning up the docs
+import sources  # for fetching the docs
 import write
 
+REPO = "MaximumADHD/Roblox-Client-Tracker"
+BRANCH = "roblox"
 
-def fetch_tree_data():
-    data_res = requests.get(
-        "https://api.github.com/repos/MaximumADHD/Roblox-Client-Tracker/git/trees/roblox?recursive=true",
-        headers=config.GH_REQ_HEADERS,
-    )
-    data_res.raise_for_status()
-
-    data = data_res.json()
-    return data
-
-
-SELFCLOSING_HTML_PATTERN = re.compile(r"<([^/]\w*)[^>]*/>", re.DOTALL)
-HTML_PATTERN = re.compile(r"<([^/]\w*)[^>]*>.*?</\1>", re.DOTALL)
+API_IDENTIFIER_PATTERN = re.compile(r"@\w+/")
 
 
 def prepare_document_for_ingest(document):
-    # Replace escaped characters with their actual characters such as &mdash;
-    document = document.replace("&mdash;", "—")
-    document = document.replace("&ndash;", "–")
-    document = document.replace("&nbsp;", " ")
-    document = document.replace("&quot;", '"')
-    document = document.replace("&apos;", "'")
-    document = document.replace("&lt;", "<")
-    document = document.replace("&gt;", ">")
-    document = document.replace("&amp;", "&")
-    # Replace <li></li> with - and <ul></ul> with \n
-    document = document.replace("<li>", "- ")
-    document = document.replace("</li>", "\n")
-    document = document.replace("<ul>", "\n")
-    document = document.replace("</ul>", "\n")
-    # Remove html elements like <img /> and <video></video>
-    document = HTML_PATTERN.sub("", document)
-    document = SELFCLOSING_HTML_PATTERN.sub("", document)
-
-    return document
+    return markup.normalize_api_document(document)
 
 
 def is_api_identifier(x):
-    return re.match(r"^@\w+/", x)
+    # Most strings are prose, so check the first character before running the pattern
+    return x.startswith("@") and API_IDENTIFIER_PATTERN.match(x)
 
 
 def replace_xml_tags(item):
     if isinstance(item, list):
         for i in range(len(item)):
             if isinstance(item[i], str):
-                bolded = re.sub(r"<strong>(.*?)</strong>", r"**\1**", item[i])
-                italicized = re.sub(r"<em>(.*?)</em>", r"*\1*", bolded)
-                monospaced = re.sub(r"<code>(.*?)</code>", r"`\1`", italicized)
-                item[i] = monospaced
+                item[i] = markup.convert_inline_tags(item[i])
             elif isinstance(item[i], list):
                 replace_xml_tags(item[i])
             elif isinstance(item[i], dict):
@@ -63,69 +34,115 @@ def replace_xml_tags(item):
     elif isinstance(item, dict):
         for prop in item:
             if isinstance(item[prop], str):
-                bolded = re.sub(r"<strong>(.*?)</strong>", r"**\1**", item[prop])
-                italicized = re.sub(r"<em>(.*?)</em>", r"*\1*", bolded)
-                monospaced = re.sub(r"<code>(.*?)</code>", r"`\1`", italicized)
-                item[prop] = monospaced
+                item[prop] = markup.convert_inline_tags(item[prop])
             elif isinstance(item[prop], list):
                 replace_xml_tags(item[prop])
             elif isinstance(item[prop], dict):
                 replace_xml_tags(item[prop])
 
 
-def replace_api_identifiers(content, object):
-    if isinstance(object, list):
-        for key in range(len(object)):
-            item = object[key]
-            if isinstance(item, str) and is_api_identifier(item):
-                ref_obj = content[item]
-                if "documentation" in ref_obj and len(ref_obj) == 1:
-                    # If the ref object only has a documentation, replace the identifier with the documentation
-                    object[key] = ref_obj["documentation"]
-                else:
-                    object[key] = ref_obj
-            else:
-                replace_api_identifiers(content, item)
+class IdentifierResolver:
+    """Replaces API identifiers in the docstring tree with the objects they refer to.
+
+    Each identifier is resolved once into a memo table, and each object is walked
+    once no matter how often it is referenced. Objects that only have a
+    documentation are replaced by that documentation. An identifier that refers
+    back to an object still being resolved is a cycle, and like an identifier
+    that refers to nothing, it is left as is.
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.resolved = {}
+        self.resolving = set()
+        self.walked = set()
+        self.cycles = 0
+        self.missing = 0
+
+    def resolve(self, identifier):
+        if identifier in self.resolved:
+            return self.resolved[identifier]
+        if identifier in self.resolving:
+            self.cycles += 1
+            return identifier
+        if identifier not in self.content:
+            self.missing += 1
+            return identifier
+
+        ref_obj = self.content[identifier]
+        self.resolving.add(identifier)
+        self.walk(ref_obj)
+        self.resolving.discard(identifier)
+
+        if (
+            isinstance(ref_obj, dict)
+            and "documentation" in ref_obj
+            and len(ref_obj) == 1
+        ):
+            # If the ref object only has a documentation, replace the identifier with the documentation
+            self.resolved[identifier] = ref_obj["documentation"]
+        else:
+            self.resolved[identifier] = ref_obj
+        return self.resolved[identifier]
 
-    elif isinstance(object, dict):
-        for key in object:
+    def walk(self, object):
+        if not isinstance(object, (list, dict)) or id(object) in self.walked:
+            return
+        self.walked.add(id(object))
+
+        keys = range(len(object)) if isinstance(object, list) else object.keys()
+        for key in keys:
             item = object[key]
-            if isinstance(item, str) and is_api_identifier(item):
-                ref_obj = content[item]
-                if "documentation" in ref_obj and len(ref_obj) == 1:
-                    # If the ref object only has a documentation, replace the identifier with the documentation
-                    object[key] = ref_obj["documentation"]
-                else:
-                    object[key] = ref_obj
+            if isinstance(item, str):
+                if is_api_identifier(item):
+                    object[key] = self.resolve(item)
             else:
-                replace_api_identifiers(content, item)
+                self.walk(item)
 
 
-def get_api_dump():
-    res = requests.get(
-        "https://raw.githubusercontent.com/MaximumADHD/Roblox-Client-Tracker/roblox/API-Dump.json"
+def replace_api_identifiers(content):
+    resolver = IdentifierResolver(content)
+    for key in content:
+        if is_api_identifier(key):
+            resolver.resolve(key)
+    resolver.walk(content)
+    if resolver.cycles > 0 or resolver.missing > 0:
+        print(
+            f"Left {resolver.cycles} cyclic and {resolver.missing} unknown api identifiers unresolved"
+        )
+
+
+def get_member_docstrings(api_docstrings):
+    """Group member docstrings by class key, so members can be looked up by name."""
+    member_docstrings = {}
+    for key, docstring in api_docstrings.items():
+        class_key, separator, member_name = key.partition(".")
+        if separator != "":
+            member_docstrings.setdefault(class_key, {})[member_name] = docstring
+    return member_docstrings
+
+
+def get_api_dump(sha):
+    return sources.fetch_json(
+        f"https://raw.githubusercontent.com/{REPO}/{sha}/API-Dump.json",
+        name=f"{REPO}/API-Dump.json",
     )
-    res.raise_for_status()
-    dump = res.json()
-    return dump
 
 
-def get_api_docstrings():
-    res = requests.get(
-        "https://raw.githubusercontent.com/MaximumADHD/Roblox-Client-Tracker/roblox/api-docs/mini/en-us.json"
-    )
-    res.raise_for_status()
-
+def get_api_docstrings(sha):
     api_docstrings = {}
     used_identifiers = []
 
-    content = res.json()
+    content = sources.fetch_json(
+        f"https://raw.githubusercontent.com/{REPO}/{sha}/api-docs/mini/en-us.json",
+        name=f"{REPO}/api-docs/mini/en-us.json",
+    )
 
     # Replace xml tags with markdown
     replace_xml_tags(content)
 
     # Replace identifiers with their object
-    replace_api_identifiers(content, content)
+    replace_api_identifiers(content)
 
     # Build the API reference
     for key in content:
@@ -178,13 +195,14 @@ def createEnumReference(enumObj, api_docstrings):
     return referenceDoc
 
 
-def createClassReference(classObj, api_docstrings):
+def createClassReference(classObj, api_docstrings, member_docstrings):
     classKey = "@roblox/globaltype/" + classObj["Name"]
     if not classKey in api_docstrings:
         # print("Couldn't find any docsstring for " + classObj["Name"])
         return ""
 
     api_docstring = api_docstrings[classKey]
+    class_members = member_docstrings.get(classKey, {})
 
     desc = api_docstring.get("documentation", "")
 
@@ -200,16 +218,15 @@ def createClassReference(classObj, api_docstrings):
     for member in classObj["Members"]:
         if "Tags" in member and "Deprecated" in member["Tags"]:
             continue
-        memberKey = classKey + "." + member["Name"]
-        # print(memberKey)
+        memberKey = member["Name"]
 
         if member["MemberType"] == "Property":
             memberBaseDesc = f"### {member['Name']} ({member['ValueType']['Name']})"
-            if not memberKey in api_docstrings:
+            if not memberKey in class_members:
                 # print("Couldn't find any docsstring for property " + classObj['Name'] + "." + member["Name"])
                 propertyDescs.append(memberBaseDesc)
                 continue
-            memberDocstring = api_docstrings[memberKey]
+            memberDocstring = class_members[memberKey]
             memberDesc = memberDocstring.get("documentation", "")
             memberCodeSample = memberDocstring.get("code_sample", "")
             if memberCodeSample != "":
@@ -220,7 +237,7 @@ def createClassReference(classObj, api_docstrings):
                 propertyDescs.append(memberBaseDesc)
 
         elif member["MemberType"] == "Function":
-            if not memberKey in api_docstrings:
+            if not memberKey in class_members:
                 # print("Couldn't find any docsstring for method " + classObj['Name'] + "." + member["Name"])
                 # Use fallback info from dump
                 memberParamsDesc = []
@@ -242,7 +259,7 @@ def createClassReference(classObj, api_docstrings):
                 methodDescs.append(memberDesc)
                 continue
 
-            memberDocstring = api_docstrings[memberKey]
+            memberDocstring = class_members[memberKey]
             memberParamsDesc = []
             for i in range(len(memberDocstring["params"])):
                 param = memberDocstring["params"][i]
@@ -292,7 +309,7 @@ def createClassReference(classObj, api_docstrings):
             methodDescs.append(memberDesc)
 
         elif member["MemberType"] == "Callback":
-            if not memberKey in api_docstrings:
+            if not memberKey in class_members:
                 # print("Couldn't find any docsstring for method " + classObj['Name'] + "." + member["Name"])
                 # Use fallback info from dump
                 memberParamsDesc = []
@@ -314,7 +331,7 @@ def createClassReference(classObj, api_docstrings):
                 callbackDescs.append(memberDesc)
                 continue
 
-            memberDocstring = api_docstrings[memberKey]
+            memberDocstring = class_members[memberKey]
             memberParamsDesc = []
             for i in range(len(memberDocstring["params"])):
                 param = memberDocstring["params"][i]
@@ -354,7 +371,7 @@ def createClassReference(classObj, api_docstrings):
             callbackDescs.append(memberDesc)
 
         elif member["MemberType"] == "Event":
-            if not memberKey in api_docstrings:
+            if not memberKey in class_members:
                 # print("Couldn't find any docsstring for event " + classObj['Name'] + "." + member["Name"])
                 # Use fallback info from dump
                 memberParamsDesc = []
@@ -372,7 +389,7 @@ def createClassReference(classObj, api_docstrings):
                 eventDescs.append(memberDesc)
                 continue
 
-            memberDocstring = api_docstrings[memberKey]
+            memberDocstring = class_members[memberKey]
             memberParamsDesc = []
             for param in member["Parameters"]:
                 memberParamsDesc.append(f"- {param['Name']}: {param['Type']['Name']}")
@@ -435,19 +452,25 @@ def createClassReference(classObj, api_docstrings):
     return referenceDoc
 
 
-def get_reference():
-    api_dump = get_api_dump()
-    api_docstrings = get_api_docstrings()
+def get_reference(sha):
+    api_dump = get_api_dump(sha)
+    with instrumentation.timed("api docstrings"):
+        api_docstrings = get_api_docstrings(sha)
 
     api_reference = {}
+    member_docstrings = get_member_docstrings(api_docstrings)
 
     for enumObj in api_dump["Enums"]:
-        enum_reference = createEnumReference(enumObj, api_docstrings)
+        with instrumentation.timed("api reference"):
+            enum_reference = createEnumReference(enumObj, api_docstrings)
         if enum_reference != "":
             api_reference["Enum." + enumObj["Name"]] = enum_reference
 
     for classObj in api_dump["Classes"]:
-        class_reference = createClassReference(classObj, api_docstrings)
+        with instrumentation.timed("api reference"):
+            class_reference = createClassReference(
+                classObj, api_docstrings, member_docstrings
+            )
         if class_reference != "":
             api_reference[classObj["Name"]] = class_reference
 
@@ -457,6 +480,6 @@ def get_reference():
 
 
 def get_sha():
-    data = fetch_tree_data()
-    write.write_text(data["sha"], "build/api-source-commit.txt")
-    return data["sha"]
+    sha = sources.get_commit_sha(REPO, BRANCH)
+    write.write_text(sha, "build/api-source-commit.txt")
+    return sha
@@ -0,0 +1,186 @@
+"""Model backends for the indexer: Together, or a deterministic local stand-in for offline runs.
+
+The local backend answers the same chat and embedding calls as the Together client,
+after a simulated latency and with a simulated rate of retryable failures, so the
+whole pipeline, including retries, concurrency limits and caching, can be run and
+benchmarked without credentials or network access.
+"""
+
+import asyncio
+import hashlib
+import random
+import re
+from functools import lru_cache
+from types import SimpleNamespace
+
+import numpy as np
+from config import (
+    EMBEDDING_MODEL,
+    INDEXER_BACKEND,
+    LOCAL_BACKEND_FAILURE_RATE,
+    LOCAL_BACKEND_LATENCY,
+    LOCAL_EMBEDDING_DIMENSIONS,
+    TOGETHERAI_API_KEY,
+)
+
+WORD_PATTERN = re.compile(r"\w+")
+SENTENCE_PATTERN = re.compile(r"[^.!?\n]+[.!?]?")
+HEADER_PATTERN = re.compile(r"^#+\s*(.+?)\s*$", re.MULTILINE)
+SUMMARY_SENTENCES = 3
+
+
+@lru_cache(maxsize=2**20)
+def get_word_feature(word: str, dimensions: int) -> tuple[int, float]:
+    """Return the dimension and sign a word is hashed to."""
+    value = int.from_bytes(
+        hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+    return value % dimensions, 1.0 if value >> 63 else -1.0
+
+
+def embed_text(text: str, dimensions: int = LOCAL_EMBEDDING_DIMENSIONS) -> list[float]:
+    """Return a unit vector of hashed word counts, so texts sharing words are similar."""
+    vector = np.zeros(dimensions)
+    for word in WORD_PATTERN.findall(text.lower()):
+        dimension, sign = get_word_feature(word, dimensions)
+        vector[dimension] += sign
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = norm = 1.0
+    return (vector / norm).tolist()
+
+
+def summarize(content: str) -> str:
+    """Return the first few sentences of the content."""
+    sentences = [
+        sentence.strip()
+        for sentence in SENTENCE_PATTERN.findall(HEADER_PATTERN.sub("", content))
+    ]
+    return " ".join(
+        [sentence for sentence in sentences if sentence][:SUMMARY_SENTENCES]
+    )
+
+
+def ask_questions(content: str) -> str:
+    """Return three questions about the headers of the content, one per line."""
+    topics = HEADER_PATTERN.findall(content)
+    if len(topics) == 0:
+        topics = [content.strip().split("\n", 1)[0][:80] or "this page"]
+    return "\n".join(
+        f"{i + 1}. What should I know about {topics[i % len(topics)].lower()}?"
+        for i in range(3)
+    )
+
+
+def count_words(text: str) -> int:
+    return len(WORD_PATTERN.findall(text))
+
+
+class LocalBackend:
+    """Stands in for together.AsyncTogether with deterministic local models.
+
+    Chat replies are a summary when the system prompt asks for one and questions
+    otherwise. Token usage is reported as word counts.
+    """
+
+    def __init__(
+        self,
+        latency: float = LOCAL_BACKEND_LATENCY,
+        failure_rate: float = LOCAL_BACKEND_FAILURE_RATE,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.complete))
+        self.embeddings = SimpleNamespace(create=self.embed)
+
+    async def simulate_request(self, path: str):
+        await asyncio.sleep(self.latency)
+        if self.random.random() < self.failure_rate:
+            import httpx  # for the response attached to API errors
+            import together
+
+            raise together.RateLimitError(
+                "Simulated rate limit",
+                response=httpx.Response(
+                    429, request=httpx.Request("POST", f"http://local/{path}")
+                ),
+                body=None,
+            )
+
+    async def complete(self, model: str, messages: list[dict[str, str]]):
+        await self.simulate_request("chat/completions")
+        system = " ".join(m["content"] for m in messages if m["role"] == "system")
+        content = " ".join(m["content"] for m in messages if m["role"] == "user")
+        reply = summarize(content) if "summary" in system else ask_questions(content)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=reply))],
+            usage=SimpleNamespace(
+                prompt_tokens=count_words(system) + count_words(content),
+                completion_tokens=count_words(reply),
+            ),
+        )
+
+    async def embed(self, input: list[str], model: str):
+        await self.simulate_request("embeddings")
+        return SimpleNamespace(
+            data=[SimpleNamespace(embedding=embed_text(text)) for text in input],
+            usage=SimpleNamespace(
+                prompt_tokens=sum(count_words(text) for text in input),
+                completion_tokens=0,
+            ),
+        )
+
+
+def create_client(backend: str = INDEXER_BACKEND):
+    """Return the client for the configured backend."""
+    if backend == "together":
+        import together
+
+        # Retries are handled by model_client so that they count against the adaptive concurrency limits
+        return together.AsyncTogether(api_key=TOGETHERAI_API_KEY, max_retries=0)
+    if backend == "local":
+        return LocalBackend()
+    raise ValueError(f"Unknown indexer backend {backend!r}")
+
+
+def get_word_tokenizer():
+    """Return a fast tokenizer with one token per word or punctuation mark, and BERT's special tokens.
+
+    Word counts are a little lower than the real tokenizer's, so chunks come out a little longer.
+    """
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+
+    tokenizer = Tokenizer(
+        models.WordLevel({"[UNK]": 0, "[CLS]": 1, "[SEP]": 2}, unk_token="[UNK]")
+    )
+    tokenizer.normalizer = normalizers.BertNormalizer()
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 1), ("[SEP]", 2)]
+    )
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        unk_token="[UNK]",
+        cls_token="[CLS]",
+        sep_token="[SEP]",
+    )
+
+
+def load_tokenizer(backend: str = INDEXER_BACKEND):
+    """Return the embedding model's tokenizer.
+
+    The local backend only uses a copy that is already downloaded, and falls back
+    to a word tokenizer without one.
+    """
+    from transformers import AutoTokenizer
+
+    if backend != "local":
+        return AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+    try:
+        return AutoTokenizer.from_pretrained(EMBEDDING_MODEL, local_files_only=True)
+    except OSError:
+        print(f"{EMBEDDING_MODEL} tokenizer isn't downloaded, using a word tokenizer")
+        return get_word_tokenizer()
@@ -0,0 +1,126 @@
+"""Micro-benchmark comparing the legacy word-by-word chunker with chunking.split_text.
+
+Runs both chunkers over the largest generated class references, next to the cost of
+tokenizing the same texts once, and writes the results to build/benchmarks/chunking.json.
+
+Usage: python indexer/benchmarks/bench_chunking.py [--count 10] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_reference
+import chunking
+import preprocessing
+import write
+from config import EMBEDDING_TOKEN_LIMIT
+
+
+def legacy_split_text(text: str, tokenizer, token_limit: int) -> list[str]:
+    """The chunker that get_embeddings used before chunking.split_text, kept for comparison."""
+
+    def count_tokens(text: str) -> int:
+        return len(tokenizer(text).get("input_ids", []))
+
+    chunks = []
+    if count_tokens(text) < token_limit:
+        chunks.append(text)
+    else:
+        words = text.split(" ")
+        chunk = []
+        while len(words) > 0:
+            next_word = words.pop(0)
+            if count_tokens(" ".join(chunk) + " " + next_word) > token_limit:
+                chunks.append(" ".join(chunk))
+                chunk = [next_word]
+            else:
+                chunk.append(next_word)
+    return chunks
+
+
+def time_chunker(
+    chunker, texts: list[str], tokenizer, repeat: int
+) -> tuple[float, int]:
+    best = float("inf")
+    chunk_count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunk_count = sum(
+            len(chunker(text, tokenizer, EMBEDDING_TOKEN_LIMIT)) for text in texts
+        )
+        best = min(best, time.perf_counter() - start)
+    return best, chunk_count
+
+
+def time_tokenizer(texts: list[str], tokenizer, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    token_count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        token_count = sum(
+            len(
+                tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)[
+                    "input_ids"
+                ]
+            )
+            for text in texts
+        )
+        best = min(best, time.perf_counter() - start)
+    return best, token_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tokenizer = preprocessing.get_tokenizer()
+
+    # Class references are the longest documents we embed
+    reference = api_reference.get_reference(api_reference.BRANCH)
+    largest = sorted(
+        [(key, text) for key, text in reference.items() if not key.startswith("Enum.")],
+        key=lambda item: len(item[1]),
+        reverse=True,
+    )[: args.count]
+    texts = [text.replace("\n", " ") for _, text in largest]
+
+    tokenize_seconds, tokens = time_tokenizer(texts, tokenizer, args.repeat)
+    legacy_seconds, legacy_chunks = time_chunker(
+        legacy_split_text, texts, tokenizer, args.repeat
+    )
+    linear_seconds, linear_chunks = time_chunker(
+        chunking.split_text, texts, tokenizer, args.repeat
+    )
+
+    results = {
+        "documents": [key for key, _ in largest],
+        "characters": sum(len(text) for text in texts),
+        "tokens": tokens,
+        "token_limit": EMBEDDING_TOKEN_LIMIT,
+        "tokenize": {
+            "seconds": tokenize_seconds,
+            "tokens_per_second": tokens / tokenize_seconds,
+        },
+        "legacy": {"seconds": legacy_seconds, "chunks": legacy_chunks},
+        "linear": {"seconds": linear_seconds, "chunks": linear_chunks},
+        "speedup": legacy_seconds / linear_seconds,
+    }
+    print(
+        f"tokenize: {tokenize_seconds:.3f}s ({tokens} tokens), "
+        f"legacy: {legacy_seconds:.3f}s ({legacy_chunks} chunks), "
+        f"linear: {linear_seconds:.3f}s ({linear_chunks} chunks), "
+        f"{results['speedup']:.1f}x faster"
+    )
+
+    os.makedirs("build/benchmarks", exist_ok=True)
+    write.write_json(results, "build/benchmarks/chunking.json")
+
+
+if __name__ == "__main__":
+    main()
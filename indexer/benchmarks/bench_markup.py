@@ -0,0 +1,175 @@
+"""Golden-output check and throughput benchmark of markup normalization against the legacy regexes.
+
+Normalizes every creator docs markdown file and every string in the API docstrings
+with both the legacy regex substitutions and the markup module, and fails if any
+output differs. Then times both over the whole corpus, and over a page of unclosed
+tags where the legacy regexes backtrack. Results are written to build/benchmarks/markup.json.
+
+Usage: python indexer/benchmarks/bench_markup.py [--zip creator-docs-main.zip] [--repeat 3]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_reference
+import config
+import creator_docs
+import markup
+import sources
+import write
+
+METADATA_PATTERN = re.compile("---(.+?)---", re.DOTALL)
+SELFCLOSING_HTML_PATTERN = re.compile(r"<([^/]\w*)[^>]*/>", re.DOTALL)
+HTML_PATTERN = re.compile(r"<([^/]\w*)[^>]*>.*?</\1>", re.DOTALL)
+EXTRA_NEWLINES_PATTERN = re.compile(r"\n[\n\s]+", re.DOTALL)
+INLINE_LINKS_PATTERN = re.compile(r"\[(.*?)\]\(.*?\)", re.DOTALL)
+API_LINKING_WITH_NAME_PATTERN = re.compile(r"`[A-Z]\w*?\.[^\n]*?\|(.*?)`", re.DOTALL)
+API_LINKING_PATTERN = re.compile(r"`[A-Z]\w*?\.([^\n]*?)`", re.DOTALL)
+
+
+def legacy_prepare_document(document: str) -> str:
+    """creator_docs.prepare_document_for_ingest before the markup module, kept for comparison."""
+    document = METADATA_PATTERN.sub("", document)
+    document = HTML_PATTERN.sub("", document)
+    document = SELFCLOSING_HTML_PATTERN.sub("", document)
+    document = INLINE_LINKS_PATTERN.sub(r"\1", document)
+    document = EXTRA_NEWLINES_PATTERN.sub("\n\n", document)
+    document = API_LINKING_WITH_NAME_PATTERN.sub(r"`\1`", document)
+    document = API_LINKING_PATTERN.sub(r"`\1`", document)
+    return document
+
+
+def legacy_prepare_api_document(document: str) -> str:
+    """api_reference.prepare_document_for_ingest before the markup module, kept for comparison."""
+    document = document.replace("&mdash;", "—")
+    document = document.replace("&ndash;", "–")
+    document = document.replace("&nbsp;", " ")
+    document = document.replace("&quot;", '"')
+    document = document.replace("&apos;", "'")
+    document = document.replace("&lt;", "<")
+    document = document.replace("&gt;", ">")
+    document = document.replace("&amp;", "&")
+    document = document.replace("<li>", "- ")
+    document = document.replace("</li>", "\n")
+    document = document.replace("<ul>", "\n")
+    document = document.replace("</ul>", "\n")
+    document = HTML_PATTERN.sub("", document)
+    document = SELFCLOSING_HTML_PATTERN.sub("", document)
+    return document
+
+
+def legacy_convert_inline_tags(text: str) -> str:
+    """The conversion in api_reference.replace_xml_tags before the markup module."""
+    bolded = re.sub(r"<strong>(.*?)</strong>", r"**\1**", text)
+    italicized = re.sub(r"<em>(.*?)</em>", r"*\1*", bolded)
+    return re.sub(r"<code>(.*?)</code>", r"`\1`", italicized)
+
+
+def collect_strings(item, strings: list[str]):
+    if isinstance(item, str):
+        strings.append(item)
+    elif isinstance(item, list):
+        for value in item:
+            collect_strings(value, strings)
+    elif isinstance(item, dict):
+        for value in item.values():
+            collect_strings(value, strings)
+
+
+def compare(name: str, legacy, linear, texts: list[str]) -> int:
+    mismatches = 0
+    for text in texts:
+        if legacy(text) != linear(text):
+            mismatches += 1
+            if mismatches <= 3:
+                print(f"{name}: output differs for {text[:80]!r}")
+    print(f"{name}: {len(texts) - mismatches}/{len(texts)} identical")
+    return mismatches
+
+
+def time_normalizer(normalizer, texts: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            normalizer(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--zip", default=config.CREATOR_DOCS_ZIP)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    documents = [
+        document
+        for _, document in creator_docs.get_documents(creator_docs.BRANCH, args.zip)
+    ]
+    docstrings = []
+    collect_strings(
+        sources.fetch_json(
+            f"https://raw.githubusercontent.com/{api_reference.REPO}/{api_reference.BRANCH}/api-docs/mini/en-us.json"
+        ),
+        docstrings,
+    )
+
+    cases = {
+        "creator_docs": (
+            legacy_prepare_document,
+            markup.normalize_document,
+            documents,
+        ),
+        "api_documents": (
+            legacy_prepare_api_document,
+            markup.normalize_api_document,
+            docstrings,
+        ),
+        "api_inline_tags": (
+            legacy_convert_inline_tags,
+            markup.convert_inline_tags,
+            docstrings,
+        ),
+        # Unclosed tags make the legacy element pattern scan the rest of the page for each one
+        "unclosed_tags": (
+            legacy_prepare_document,
+            markup.normalize_document,
+            ["<div class='note'>\n" * 2000 + "text\n"],
+        ),
+    }
+
+    mismatches = 0
+    results = {}
+    for name, (legacy, linear, texts) in cases.items():
+        mismatches += compare(name, legacy, linear, texts)
+        megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+        legacy_seconds = time_normalizer(legacy, texts, args.repeat)
+        linear_seconds = time_normalizer(linear, texts, args.repeat)
+        results[name] = {
+            "texts": len(texts),
+            "megabytes": megabytes,
+            "legacy_seconds": legacy_seconds,
+            "linear_seconds": linear_seconds,
+            "legacy_mb_per_second": megabytes / legacy_seconds,
+            "linear_mb_per_second": megabytes / linear_seconds,
+        }
+        print(
+            f"{name}: legacy {megabytes / legacy_seconds:.1f} MB/s, linear {megabytes / linear_seconds:.1f} MB/s"
+        )
+
+    os.makedirs("build/benchmarks", exist_ok=True)
+    write.write_json(results, "build/benchmarks/markup.json")
+
+    if mismatches > 0:
+        print(f"{mismatches} outputs differ from the legacy regexes")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
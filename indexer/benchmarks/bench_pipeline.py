@@ -0,0 +1,117 @@
+"""Benchmark of full indexing pipeline throughput against the local model backend.
+
+Runs indexer/main.py offline on the source fixtures, in a scratch directory, three times:
+cold (nothing cached), warm (model results cached, but every document reprocessed) and
+incremental (nothing changed since the last run). Each pass is a separate process, and
+its documents/s, stage times and model calls come from its run report. Results are
+written to build/benchmarks/pipeline.json.
+
+Usage: python indexer/benchmarks/bench_pipeline.py --fixtures path/to/fixtures [--latency 0.05] [--failure-rate 0]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+INDEXER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, INDEXER_DIR)
+
+import write
+
+# Files removed before each pass, relative to the scratch directory
+PASSES = {
+    "cold": ["build"],
+    "warm": ["build/manifest.json"],
+    "incremental": [],
+}
+
+
+def run_pass(workdir: str, env: dict[str, str]) -> dict:
+    with open(os.path.join(workdir, "main.log"), "w", encoding="utf-8") as log:
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(INDEXER_DIR, "main.py")],
+            cwd=workdir,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            check=True,
+        )
+        seconds = time.perf_counter() - start
+
+    with open(
+        os.path.join(workdir, "build/run-report.json"), "r", encoding="utf-8"
+    ) as f:
+        report = json.load(f)
+    processed = report["documents"]["processed"]
+    return {
+        "seconds": seconds,
+        "documents": report["documents"]["total"],
+        "processed": processed,
+        "documents_per_second": processed / report["seconds"] if processed else 0.0,
+        "stages": {
+            name: {
+                "wall_seconds": stage["wall_seconds"],
+                "busy_seconds": stage["busy_seconds"],
+                "p50": stage["latency"]["p50"],
+                "p95": stage["latency"]["p95"],
+            }
+            for name, stage in report["stages"].items()
+        },
+        "model_calls": {
+            name: model["calls"] for name, model in report["models"].items()
+        },
+        "cache": report["cache"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=os.getenv("SOURCES_FIXTURES_DIR"))
+    parser.add_argument("--workdir", default="build/benchmarks/pipeline")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    if args.fixtures is None:
+        parser.error("--fixtures or SOURCES_FIXTURES_DIR is required")
+
+    env = dict(
+        os.environ,
+        INDEXER_BACKEND="local",
+        SOURCES_FIXTURES_DIR=os.path.abspath(args.fixtures),
+        LOCAL_BACKEND_LATENCY=str(args.latency),
+        LOCAL_BACKEND_FAILURE_RATE=str(args.failure_rate),
+    )
+    env.pop("CREATOR_DOCS_ZIP", None)
+    os.makedirs(args.workdir, exist_ok=True)
+
+    results = {
+        "latency": args.latency,
+        "failure_rate": args.failure_rate,
+        "cpu_count": os.cpu_count(),
+        "passes": {},
+    }
+    for name, removed in PASSES.items():
+        for path in removed:
+            path = os.path.join(args.workdir, path)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        result = run_pass(args.workdir, env)
+        results["passes"][name] = result
+        print(
+            f"{name}: {result['processed']} of {result['documents']} documents processed in {result['seconds']:.1f}s, "
+            f"{result['documents_per_second']:.1f} documents/s"
+        )
+
+    os.makedirs("build/benchmarks", exist_ok=True)
+    write.write_json(results, "build/benchmarks/pipeline.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark of index size, query latency and recall@k at reduced embedding dimensions.
+
+Fits each reduction on the full embeddings in build/index.json, then compares
+exact search on the reduced embeddings with exact search on the full ones, for
+perturbed copies of the index's rows as queries (see search.sample_queries).
+Results are written to build/benchmarks/reduction.json, keyed by dimensions.
+
+Usage: python indexer/benchmarks/bench_reduction.py [--dimensions 64 128 256 512] [--method pca]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import reduction
+import search
+import write
+
+
+def measure(index: search.SearchIndex, query_vectors: np.ndarray, k: int):
+    start = time.perf_counter()
+    results = [
+        {
+            document
+            for document, _ in index.top_k(
+                index.score_documents(index.project_queries(query)), k, -1.0
+            )
+        }
+        for query in query_vectors
+    ]
+    return results, (time.perf_counter() - start) / len(query_vectors) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default="build/index.json")
+    parser.add_argument(
+        "--dimensions", type=int, nargs="+", default=[64, 128, 256, 512]
+    )
+    parser.add_argument("--method", default="pca", choices=["pca", "truncate"])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    full = search.SearchIndex.from_json(args.index)
+    query_vectors = search.sample_queries(full.embeddings, args.queries)
+
+    exact, exact_latency = measure(full, query_vectors, args.k)
+    results = {
+        "method": args.method,
+        "k": args.k,
+        "queries": len(query_vectors),
+        "full": {
+            "dimensions": full.embeddings.shape[1],
+            "bytes": int(full.embeddings.nbytes),
+            "latency_ms": exact_latency,
+        },
+        "reduced": {},
+    }
+    print(
+        f"{full.embeddings.shape[1]} dimensions: {full.embeddings.nbytes / 1e6:.1f} MB, {exact_latency:.3f} ms"
+    )
+
+    for dimensions in args.dimensions:
+        projection = reduction.fit_projection(full.embeddings, args.method, dimensions)
+        reduced = search.SearchIndex(
+            reduction.project(full.embeddings, projection),
+            full.row_offsets,
+            full.get_document,
+            projection=projection,
+        )
+        found, latency = measure(reduced, query_vectors, args.k)
+        recall = float(
+            np.mean(
+                [
+                    len(hits & truth) / max(len(truth), 1)
+                    for hits, truth in zip(found, exact)
+                ]
+            )
+        )
+        results["reduced"][str(dimensions)] = {
+            "bytes": int(reduced.embeddings.nbytes + projection.nbytes),
+            "latency_ms": latency,
+            "recall": recall,
+        }
+        print(
+            f"{dimensions} dimensions: {reduced.embeddings.nbytes / 1e6:.1f} MB, {latency:.3f} ms, recall@{args.k} {recall:.1%}"
+        )
+
+    os.makedirs("build/benchmarks", exist_ok=True)
+    write.write_json(results, "build/benchmarks/reduction.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Benchmark of query latency percentiles and recall@k for exact, pruned, quantized and ANN search.
+
+Builds a synthetic index of the given size, where each document's embeddings are
+scattered around a topic direction like a page's sections, summary and questions.
+Queries are noisy copies of random embedding rows. Every method is measured one
+query at a time against exact search, and results are written to build/benchmarks/search.json.
+
+Usage: python indexer/benchmarks/bench_search.py [--documents 5000] [--rows 12] [--dimensions 1024]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ann
+import instrumentation
+import numpy as np
+import pruning
+import quantization
+import search
+import write
+from config import QUANTIZATION_SCALES
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def build_synthetic_index(
+    documents: int, rows: int, dimensions: int, topics: int, seed: int
+) -> search.SearchIndex:
+    """Return an index of unit embeddings, with a varying number of rows per document."""
+    rng = np.random.default_rng(seed)
+    topic_vectors = normalize(rng.standard_normal((topics, dimensions)))
+    document_vectors = normalize(
+        topic_vectors[rng.integers(topics, size=documents)]
+        + 0.6 * normalize(rng.standard_normal((documents, dimensions)))
+    )
+    row_counts = rng.integers(max(1, rows // 2), rows * 3 // 2 + 1, size=documents)
+    row_offsets = np.concatenate([[0], np.cumsum(row_counts)])
+    embeddings = normalize(
+        np.repeat(document_vectors, row_counts, axis=0)
+        + 0.8 * normalize(rng.standard_normal((row_offsets[-1], dimensions)))
+    ).astype(np.float32)
+    return search.SearchIndex(
+        embeddings, row_offsets, lambda document: {"title": str(document)}
+    )
+
+
+def measure(search_ids, query_vectors: np.ndarray) -> tuple[list[set[int]], dict]:
+    found = []
+    latencies = []
+    for query in query_vectors:
+        start = time.perf_counter()
+        results = search_ids(query)
+        latencies.append(time.perf_counter() - start)
+        found.append({document for document, _ in results})
+    histogram = instrumentation.get_histogram(latencies)
+    return found, {
+        "p50_ms": histogram["p50"] * 1000,
+        "p95_ms": histogram["p95"] * 1000,
+        "p99_ms": instrumentation.percentile(latencies, 0.99) * 1000,
+        "mean_ms": histogram["sum"] / len(latencies) * 1000,
+    }
+
+
+def get_recall(found: list[set[int]], exact: list[set[int]]) -> float:
+    return float(
+        np.mean(
+            [
+                len(hits & truth) / max(len(truth), 1)
+                for hits, truth in zip(found, exact)
+            ]
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--rows", type=int, default=12, help="mean rows per document")
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_synthetic_index(
+        args.documents, args.rows, args.dimensions, args.topics, args.seed
+    )
+    rng = np.random.default_rng(args.seed + 1)
+    query_rows = rng.choice(len(index.embeddings), args.queries, replace=False)
+    query_vectors = normalize(
+        index.embeddings[query_rows]
+        + 0.5 * normalize(rng.standard_normal((args.queries, args.dimensions)))
+    ).astype(np.float32)
+    print(
+        f"Built {args.documents} documents with {len(index.embeddings)} rows in {time.perf_counter() - start:.1f}s"
+    )
+
+    start = time.perf_counter()
+    ivf = ann.IVFIndex.from_arrays(index, ann.build_ivf(index.embeddings))
+    quantized_arrays = quantization.build_quantized(
+        index.embeddings, QUANTIZATION_SCALES
+    )
+    bounded = pruning.BoundedSearchIndex.from_arrays(
+        index, pruning.build_bounds(index.embeddings, index.row_offsets)
+    )
+    build_seconds = time.perf_counter() - start
+
+    exact, exact_latency = measure(
+        lambda query: index.top_k(index.score_documents(query), args.k, -1.0),
+        query_vectors,
+    )
+    methods = {"exact": dict(exact_latency, recall=1.0)}
+
+    def add(name: str, search_ids):
+        found, latency = measure(search_ids, query_vectors)
+        methods[name] = dict(latency, recall=get_recall(found, exact))
+
+    add("pruned", lambda query: bounded.search_ids(query, args.k, -1.0)[0])
+    quantized = quantization.QuantizedSearchIndex.from_arrays(
+        index, quantized_arrays, QUANTIZATION_SCALES
+    )
+    add("int8", lambda query: quantized.search_ids(query, args.k, -1.0))
+    # float16 is a storage format: stored at half size and converted to float32 once at load
+    float16 = search.SearchIndex(
+        index.embeddings.astype(np.float16), index.row_offsets, index.get_document
+    )
+    add(
+        "float16",
+        lambda query: float16.top_k(float16.score_documents(query), args.k, -1.0),
+    )
+    for nprobe in args.nprobe:
+        add(
+            f"ann_nprobe_{nprobe}",
+            lambda query: ivf.search_ids(query, args.k, -1.0, nprobe),
+        )
+
+    for name, result in methods.items():
+        print(
+            f"{name}: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+            f"recall@{args.k} {result['recall']:.1%}"
+        )
+
+    results = {
+        "documents": args.documents,
+        "rows": len(index.embeddings),
+        "dimensions": args.dimensions,
+        "queries": args.queries,
+        "k": args.k,
+        "ann_lists": len(ivf.centroids),
+        "build_seconds": build_seconds,
+        "methods": methods,
+    }
+    os.makedirs("build/benchmarks", exist_ok=True)
+    write.write_json(results, "build/benchmarks/search.json")
+
+
+if __name__ == "__main__":
+    main()
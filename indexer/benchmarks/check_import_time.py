@@ -0,0 +1,103 @@
+"""Checks that the lightweight indexer modules import quickly and without heavy dependencies.
+
+Imports each module in a fresh interpreter with python -X importtime, best of a few
+runs, and fails if its cumulative import time is over the budget or if it pulled in
+any of the heavy packages, which are only meant to be imported on first use.
+Results are written to build/benchmarks/import-time.json.
+
+Usage: python indexer/benchmarks/check_import_time.py [--budget-ms 100] [--repeat 3]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+INDEXER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, INDEXER_DIR)
+
+import write
+
+LIGHTWEIGHT_MODULES = (
+    "config",
+    "markup",
+    "chunking",
+    "creator_docs",
+    "api_reference",
+    "sources",
+    "manifest",
+    "cache",
+    "instrumentation",
+    "model_client",
+    "packed_index",
+    "reduction",
+    "search",
+    "shards",
+    "delta",
+    "ann",
+    "quantization",
+    "pruning",
+)
+HEAVY_PACKAGES = ("together", "transformers", "tokenizers", "requests", "httpx")
+
+
+def measure_import(module: str) -> tuple[float, list[str]]:
+    """Return the cumulative import time of a module in ms, and the heavy packages it imported."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys, {module}; print(' '.join(sys.modules))",
+        ],
+        cwd=INDEXER_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    microseconds = None
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package, indented by nesting depth
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].rstrip() == f" {module}":
+            microseconds = int(fields[1])
+    imported = set(result.stdout.split())
+    return microseconds / 1000, [name for name in HEAVY_PACKAGES if name in imported]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {"budget_ms": args.budget_ms, "modules": {}}
+    failures = 0
+    for module in LIGHTWEIGHT_MODULES:
+        measurements = [measure_import(module) for _ in range(args.repeat)]
+        milliseconds = min(ms for ms, _ in measurements)
+        heavy = measurements[0][1]
+        results["modules"][module] = {"import_ms": milliseconds, "heavy": heavy}
+
+        problems = []
+        if milliseconds > args.budget_ms:
+            problems.append(f"over the {args.budget_ms:.0f} ms budget")
+        if len(heavy) > 0:
+            problems.append(f"imports {', '.join(heavy)}")
+        failures += len(problems) > 0
+        print(
+            f"{module}: {milliseconds:.1f} ms"
+            + (f" ({'; '.join(problems)})" if problems else "")
+        )
+
+    os.makedirs("build/benchmarks", exist_ok=True)
+    write.write_json(results, "build/benchmarks/import-time.json")
+
+    if failures > 0:
+        print(f"{failures} modules are over budget or import heavy packages")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
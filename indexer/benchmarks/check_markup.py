@@ -0,0 +1,55 @@
+"""Checks markup normalization against stored golden outputs, without the docs corpus or network access.
+
+markup_cases.json holds small inputs covering front matter, nested and unclosed
+elements, self-closing tags, links, API links, entities, list and inline tags.
+Their expected outputs are those of the legacy regexes in bench_markup.py, which
+the linear-time markup module must reproduce exactly. Results are written to
+build/benchmarks/markup-golden.json.
+
+Usage: python indexer/benchmarks/check_markup.py
+"""
+
+import argparse
+import json
+import os
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+import markup
+import write
+
+CASES_PATH = os.path.join(BENCHMARKS_DIR, "markup_cases.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", default=CASES_PATH)
+    args = parser.parse_args()
+
+    with open(args.cases, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+
+    failures = []
+    for case in cases:
+        output = getattr(markup, case["function"])(case["input"])
+        if output != case["expected"]:
+            failures.append(case["name"])
+            print(f"{case['function']} {case['name']}: output differs")
+            print(f"  expected {case['expected']!r}")
+            print(f"  got      {output!r}")
+    print(f"{len(cases) - len(failures)}/{len(cases)} markup cases match")
+
+    os.makedirs("build/benchmarks", exist_ok=True)
+    write.write_json(
+        {"cases": len(cases), "failures": failures},
+        "build/benchmarks/markup-golden.json",
+    )
+
+    if len(failures) > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Checks int8 scoring against exact scoring for both scale modes, without an index or network access.
+
+Each case quantizes a random matrix per row and per dimension and compares the
+approximate scores of QuantizedSearchIndex to the exact float32 scores. Square
+matrices are included, since there the number of scales is the same in both modes
+and only the recorded scale mode tells them apart. Results are written to
+build/benchmarks/quantization-check.json.
+
+Usage: python indexer/benchmarks/check_quantization.py
+"""
+
+import argparse
+import os
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+import numpy as np
+import quantization
+import write
+from search import SearchIndex
+
+# (rows, dimensions) of the checked matrices
+SHAPES = ((64, 64), (300, 48), (48, 300))
+# Largest allowed difference between approximate and exact scores of unit vectors
+TOLERANCE = 0.05
+
+
+def check(rows: int, dimensions: int, scale_mode: str, seed: int) -> float:
+    """Return the largest score error of int8 search on a random matrix."""
+    rng = np.random.default_rng(seed)
+    # Uneven dimension magnitudes, so per-dimension scales differ from each other
+    embeddings = rng.standard_normal((rows, dimensions)) * rng.uniform(
+        0.1, 2.0, dimensions
+    )
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = embeddings.astype(np.float32)
+    index = SearchIndex(embeddings, np.arange(rows + 1), lambda document: {})
+    quantized = quantization.QuantizedSearchIndex.from_arrays(
+        index, quantization.build_quantized(embeddings, scale_mode), scale_mode
+    )
+    query = embeddings[rng.integers(rows)]
+    return float(np.abs(quantized.score_rows(query) - embeddings @ query).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = []
+    for rows, dimensions in SHAPES:
+        for scale_mode in ("row", "dimension"):
+            error = check(rows, dimensions, scale_mode, args.seed)
+            results.append(
+                {
+                    "rows": rows,
+                    "dimensions": dimensions,
+                    "scales": scale_mode,
+                    "max_error": error,
+                    "ok": error <= TOLERANCE,
+                }
+            )
+            print(
+                f"{rows}x{dimensions} per-{scale_mode}: max score error {error:.4f}"
+                + ("" if error <= TOLERANCE else f", over {TOLERANCE}")
+            )
+
+    os.makedirs("build/benchmarks", exist_ok=True)
+    write.write_json(
+        {"tolerance": TOLERANCE, "cases": results},
+        "build/benchmarks/quantization-check.json",
+    )
+
+    if not all(result["ok"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
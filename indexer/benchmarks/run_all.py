@@ -0,0 +1,148 @@
+"""Runs the benchmark suite and collects the results, to compare runs over time.
+
+Runs normalization (bench_markup), chunking and tokenization (bench_chunking), the
+full pipeline against the local backend (bench_pipeline), dimension reduction on the
+index the pipeline built (bench_reduction), search (bench_search), the import time
+budget (check_import_time), the stored markup outputs (check_markup) and int8 scoring
+(check_quantization), each in its own process. Their results are combined with the commit, date and
+machine into build/benchmarks/suite-<timestamp>.json. With --compare, timings and
+recalls that moved by more than --tolerance against an earlier suite file are listed.
+
+Source fixtures are needed for everything but search and the checks, see
+SOURCES_FIXTURES_DIR.
+
+Usage: python indexer/benchmarks/run_all.py --fixtures path/to/fixtures [--only search] [--compare build/benchmarks/suite-....json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+import write
+
+# Index built by bench_pipeline in its default scratch directory
+PIPELINE_INDEX = "build/benchmarks/pipeline/build/index.json"
+# Benchmark name -> (script, whether it needs the source fixtures, arguments)
+BENCHMARKS = {
+    "markup": ("bench_markup.py", True, []),
+    "chunking": ("bench_chunking.py", True, []),
+    "pipeline": ("bench_pipeline.py", True, []),
+    "reduction": ("bench_reduction.py", True, ["--index", PIPELINE_INDEX]),
+    "search": ("bench_search.py", False, []),
+    "import-time": ("check_import_time.py", False, []),
+    "markup-golden": ("check_markup.py", False, []),
+    "quantization-check": ("check_quantization.py", False, []),
+}
+# Metrics compared between suite runs, by the end of their name
+COMPARED_SUFFIXES = (
+    "seconds",
+    "_ms",
+    "per_second",
+    "recall",
+)
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=BENCHMARKS_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(item, prefix: str = "") -> dict[str, float]:
+    """Return the numbers in nested results, keyed by their dotted path."""
+    if isinstance(item, dict):
+        values = {}
+        for key, value in item.items():
+            values.update(flatten(value, f"{prefix}.{key}" if prefix else key))
+        return values
+    if isinstance(item, (int, float)) and not isinstance(item, bool):
+        return {prefix: float(item)}
+    return {}
+
+
+def compare(results: dict, previous: dict, tolerance: float):
+    current_values = flatten(results["results"])
+    previous_values = flatten(previous["results"])
+    changes = []
+    for key, value in current_values.items():
+        if not key.endswith(COMPARED_SUFFIXES) or key not in previous_values:
+            continue
+        before = previous_values[key]
+        if before == 0:
+            continue
+        change = value / before - 1
+        if abs(change) > tolerance:
+            changes.append((key, before, value, change))
+
+    print(
+        f"Compared with {(previous.get('commit') or 'unknown')[:7]} from {previous.get('date')}: "
+        f"{len(changes)} metrics moved by more than {tolerance:.0%}"
+    )
+    for key, before, value, change in changes:
+        print(f"  {key}: {before:.4g} -> {value:.4g} ({change:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=os.getenv("SOURCES_FIXTURES_DIR"))
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    env = dict(os.environ, INDEXER_BACKEND="local")
+    if args.fixtures is not None:
+        env["SOURCES_FIXTURES_DIR"] = os.path.abspath(args.fixtures)
+
+    results = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": {},
+    }
+    for name in args.only or BENCHMARKS:
+        script, needs_fixtures, script_args = BENCHMARKS[name]
+        if needs_fixtures and args.fixtures is None:
+            print(f"Skipping {name}, it needs --fixtures or SOURCES_FIXTURES_DIR")
+            continue
+        if name == "reduction" and not os.path.exists(PIPELINE_INDEX):
+            print(
+                f"Skipping {name}, it needs the index built by the pipeline benchmark"
+            )
+            continue
+        print(f"Running {name}")
+        subprocess.run(
+            [sys.executable, os.path.join(BENCHMARKS_DIR, script), *script_args],
+            env=env,
+            check=True,
+        )
+        with open(f"build/benchmarks/{name}.json", "r", encoding="utf-8") as f:
+            results["results"][name] = json.load(f)
+
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    os.makedirs("build/benchmarks", exist_ok=True)
+    write.write_json(results, f"build/benchmarks/suite-{timestamp}.json")
+
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f), args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import hashlib  # for content-addressed keys
+import os
+import sqlite3  # for the on-disk store
+import threading
+import time
+import unicodedata
+from array import array  # for compact float storage
+
+import config
+
+CACHE_PATH = "build/cache/cache.sqlite"
+# Keys per SELECT, under SQLite's limit on the number of query parameters
+SELECT_BATCH_SIZE = 500
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so that insignificant differences don't cause cache misses."""
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\r\n", "\n")
+    return text.strip()
+
+
+def make_key(kind: str, model: str, version: str, text: str) -> str:
+    """Return the content address for a result."""
+    return hashlib.sha256(
+        "\x00".join([kind, model, version, normalize_text(text)]).encode("utf-8")
+    ).hexdigest()
+
+
+def pack_floats(values: list[float]) -> bytes:
+    """Pack a vector into bytes without losing precision."""
+    return array("d", values).tobytes()
+
+
+def unpack_floats(data: bytes) -> list[float]:
+    """Unpack a vector packed with pack_floats."""
+    values = array("d")
+    values.frombytes(data)
+    return values.tolist()
+
+
+class Cache:
+    """A size-bounded, content-addressed cache of model results stored in SQLite.
+
+    Entries are keyed by (kind, model, prompt version, normalized input text) and
+    the least recently used entries are evicted once the cache grows past max_bytes.
+    Safe to use from multiple threads.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = config.CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._connection = None
+        self._total_bytes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, kind TEXT, value BLOB, size INTEGER, last_used REAL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+            )
+            self._total_bytes = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()[0]
+        return self._connection
+
+    def _record(self, kind: str, stat: str, amount: int = 1):
+        kind_stats = self.stats.setdefault(
+            kind, {"hits": 0, "misses": 0, "bytes_read": 0, "bytes_written": 0}
+        )
+        kind_stats[stat] += amount
+
+    def _select(
+        self, connection: sqlite3.Connection, column: str, keys: list[str]
+    ) -> dict[str, object]:
+        values = {}
+        for first in range(0, len(keys), SELECT_BATCH_SIZE):
+            batch = keys[first : first + SELECT_BATCH_SIZE]
+            values.update(
+                connection.execute(
+                    f"SELECT key, {column} FROM entries WHERE key IN ({', '.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+            )
+        return values
+
+    def get(self, kind: str, model: str, version: str, text: str) -> bytes | None:
+        """Return the cached value, or None on a miss."""
+        return self.get_many(kind, model, version, [text])[0]
+
+    def get_many(
+        self, kind: str, model: str, version: str, texts: list[str]
+    ) -> list[bytes | None]:
+        """Return the cached value of each text, or None for misses, in one transaction."""
+        keys = [make_key(kind, model, version, text) for text in texts]
+        with self._lock:
+            connection = self._connect()
+            try:
+                connection.execute("BEGIN")
+                values = self._select(connection, "value", list(dict.fromkeys(keys)))
+                connection.executemany(
+                    "UPDATE entries SET last_used = ? WHERE key = ?",
+                    [(time.time(), key) for key in values],
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+            results = []
+            for key in keys:
+                value = values.get(key)
+                if value is None:
+                    self._record(kind, "misses")
+                else:
+                    self._record(kind, "hits")
+                    self._record(kind, "bytes_read", len(value))
+                results.append(value)
+            return results
+
+    def put(self, kind: str, model: str, version: str, text: str, value: bytes):
+        """Store a value, evicting the least recently used entries if over budget."""
+        self.put_many(kind, model, version, [(text, value)])
+
+    def put_many(
+        self, kind: str, model: str, version: str, items: list[tuple[str, bytes]]
+    ):
+        """Store (text, value) pairs in one transaction, evicting the least recently used entries if over budget."""
+        entries = {make_key(kind, model, version, text): value for text, value in items}
+        if len(entries) == 0:
+            return
+        with self._lock:
+            connection = self._connect()
+            try:
+                connection.execute("BEGIN")
+                previous = self._select(connection, "size", list(entries))
+                self._total_bytes -= sum(previous.values())
+
+                now = time.time()
+                connection.executemany(
+                    "INSERT OR REPLACE INTO entries (key, kind, value, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (key, kind, value, len(value), now)
+                        for key, value in entries.items()
+                    ],
+                )
+                written = sum(len(value) for value in entries.values())
+                self._total_bytes += written
+                self._record(kind, "bytes_written", written)
+
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                self._total_bytes = connection.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()[0]
+                raise
+
+    def _evict(self):
+        # Trim down to 90% of the budget so we don't evict on every put
+        target = self.max_bytes * 0.9
+        connection = self._connect()
+        evicted = 0
+        for key, size in connection.execute(
+            "SELECT key, size FROM entries ORDER BY last_used ASC"
+        ).fetchall():
+            if self._total_bytes <= target:
+                break
+            connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._total_bytes -= size
+            evicted += 1
+        print(f"Evicted {evicted} cache entries")
+
+    def report(self) -> str:
+        """Return a human readable summary of cache usage for this run."""
+        lines = [f"Cache {self.path} ({self._total_bytes / 1e6:.1f} MB stored)"]
+        for kind, kind_stats in sorted(self.stats.items()):
+            lookups = kind_stats["hits"] + kind_stats["misses"]
+            hit_rate = kind_stats["hits"] / lookups if lookups > 0 else 0
+            lines.append(
+                f"  {kind}: {kind_stats['hits']} hits, {kind_stats['misses']} misses ({hit_rate:.0%}), "
+                f"{kind_stats['bytes_read'] / 1e6:.1f} MB read, {kind_stats['bytes_written'] / 1e6:.1f} MB written"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,57 @@
+SENTENCE_ENDINGS = (".", "!", "?", ":", ";")
+
+
+def split_text(text: str, tokenizer, token_limit: int) -> list[str]:
+    """Split a string into chunks that each fit within token_limit tokens.
+
+    The text is tokenized once and chunks are cut using the fast tokenizer's offset
+    mapping, preferring sentence ends, then whitespace, over cutting mid-word.
+    Runs in linear time in the length of the text.
+    """
+    encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+    offsets = encoding["offset_mapping"]
+    special_tokens = tokenizer.num_special_tokens_to_add(pair=False)
+
+    if len(offsets) + special_tokens < token_limit:
+        return [text]
+
+    budget = token_limit - special_tokens
+    chunks = []
+    start = 0
+    while start < len(offsets):
+        end = min(start + budget, len(offsets))
+        if end < len(offsets):
+            end = find_cut(text, offsets, start, end)
+
+        chunk = text[offsets[start][0] : offsets[end - 1][1]].strip()
+        if chunk != "":
+            chunks.append(chunk)
+        start = end
+
+    return chunks
+
+
+def find_cut(text: str, offsets: list[tuple[int, int]], start: int, end: int) -> int:
+    """Return the token index to end a chunk at, between the middle of the window and end.
+
+    Only searching the second half of the window keeps every chunk at least half
+    full, which bounds the total work to linear time.
+    """
+    floor = start + max((end - start) // 2, 1)
+
+    whitespace_cut = None
+    for i in range(end, floor - 1, -1):
+        previous_end = offsets[i - 1][1]
+        if offsets[i][0] <= previous_end:
+            # Tokens are adjacent, so cutting here would split a word
+            continue
+        if text[previous_end - 1] in SENTENCE_ENDINGS:
+            return i
+        if whitespace_cut is None:
+            whitespace_cut = i
+
+    if whitespace_cut is not None:
+        return whitespace_cut
+
+    # No whitespace to cut at, so fall back to a hard cut at the token limit
+    return end
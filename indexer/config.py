@@ -8,14 +8,100 @@ EMBEDDING_MODEL = "BAAI/bge-large-en-v1.5"
 SUMMARY_MODEL = "meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo"
 QUESTION_MODEL = "meta-llama/Meta-Llama-3.1-405B-Instruct-Turbo"
 
+# Editing a prompt invalidates the cached results and manifest entries made with it
+SUMMARY_PROMPT = (
+    "You are a summary generator. "
+    "Your summary will be used to create vector embeddings for content to improve semantic searches. "
+    "When the user provides content, respond with a summary of the content. "
+    "Do NOT include any text other than the summary. Keep your summary to just a few sentences."
+)
+QUESTION_PROMPT = (
+    "Your job is to come up with three varied questions that can be answered by the given documentation excerpt. "
+    "Your questions will be used to create vector embeddings to improve semantic searches. "
+    "For example, a documentation excerpt about animations can answer questions about how to make an NPC dance."
+    "When the user provides a documentation excerpt, respond with three relevant questions that can be answered by the excerpt. "
+    "Do NOT include any text other than the questions. Put each question on a new line."
+)
+
+# BGE models expect queries to be prefixed with this instruction, documents are embedded as is
+QUERY_INSTRUCTION = "Represent this sentence for searching relevant passages: "
+
 EMBEDDING_TOKEN_LIMIT = 500
 EMBEDDING_BATCH_LIMIT = 25
+# Seconds a partially filled embedding batch waits for more inputs before it is sent
+EMBEDDING_BATCH_LATENCY = 0.5
+
+# Maximum number of concurrent requests to each model endpoint.
+# Concurrency backs off from these when a model starts throttling us and recovers gradually.
+SUMMARY_CONCURRENCY = 8
+QUESTION_CONCURRENCY = 8
+EMBEDDING_CONCURRENCY = 4
+# Documents processed at once. Enough to keep the summary and question models busy while
+# the next documents are preprocessed, without holding the whole source in memory.
+DOCUMENT_CONCURRENCY = 2 * max(SUMMARY_CONCURRENCY, QUESTION_CONCURRENCY)
+
+# Retries for transient model API failures, with jittered exponential backoff in seconds
+MAX_RETRIES = 6
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+# USD per million (input, output) tokens, from Together's pricing page, for the cost estimate in the run report.
+# Models without a price are reported without a cost.
+MODEL_PRICES = {
+    EMBEDDING_MODEL: (0.02, 0.0),
+    SUMMARY_MODEL: (0.88, 0.88),
+    QUESTION_MODEL: (3.5, 3.5),
+}
 
 INDEX_VERSION = "v1.1"
 
+# Precision of the embedding matrix in build/index.bin ("float32" or "float16")
+PACKED_INDEX_DTYPE = "float32"
+
+# Optional dimension reduction of the embeddings in build/index.bin: None, "pca", or "truncate"
+# (only for Matryoshka embedding models). index.json always keeps the full embeddings.
+EMBEDDING_REDUCTION = None
+EMBEDDING_REDUCED_DIMENSIONS = 256
+
+# Approximate nearest neighbor (IVF) index stored in build/index.bin.
+# More lists make each probe cheaper, more probes trade latency for recall.
+ANN_NLIST = None  # None picks 2 * sqrt(number of embeddings)
+ANN_NPROBE = 16
+
+# Quantized copies of the embeddings stored in build/index.bin. Int8 scales are per "row" or per "dimension".
+# Quantized search re-ranks this many of its best documents with the full precision embeddings.
+QUANTIZATION_SCALES = "row"
+QUANTIZATION_RERANK = 32
+
+# Per-document bounding cones stored in build/index.bin, for exact search that skips documents
+# that can't make the top k. Off by default: on real queries the bounds rarely prune enough to
+# beat one matrix product over every embedding, see build/pruning-report.json when enabled.
+PRUNING_BOUNDS = False
+
+# Sharded release artifacts for clients that load content lazily: build/index-vectors.bin holds the embeddings
+# and document keys, and content is split into gzip shards of this many documents, listed in build/content-manifest.json
+CONTENT_SHARD_DOCUMENTS = 64
+
+# Upper bound for the on-disk cache of summaries, questions and embeddings
+CACHE_MAX_BYTES = 2 * 1024**3
+
+# Local creator-docs zip (as downloaded from GitHub) to use instead of downloading it, for offline runs
+CREATOR_DOCS_ZIP = os.getenv("CREATOR_DOCS_ZIP")
+
 # GitHub API token
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
+# Model backend: "together", or "local" for deterministic stand-in models that run offline.
+# The local backend waits LOCAL_BACKEND_LATENCY seconds per request and fails LOCAL_BACKEND_FAILURE_RATE of them with a 429.
+INDEXER_BACKEND = os.getenv("INDEXER_BACKEND", "together")
+LOCAL_BACKEND_LATENCY = float(os.getenv("LOCAL_BACKEND_LATENCY", "0.05"))
+LOCAL_BACKEND_FAILURE_RATE = float(os.getenv("LOCAL_BACKEND_FAILURE_RATE", "0"))
+LOCAL_EMBEDDING_DIMENSIONS = 1024
+
+# Directory to read every source from instead of GitHub, for offline runs. It holds creator-docs.zip
+# (a GitHub archive of Roblox/creator-docs), API-Dump.json and en-us.json (from Roblox-Client-Tracker).
+SOURCES_FIXTURES_DIR = os.getenv("SOURCES_FIXTURES_DIR")
+
 # TogetherAI API key for embedding & summary model
 TOGETHERAI_API_KEY = os.getenv("TOGETHERAI_API_KEY")
 
@@ -1,12 +1,14 @@
 import os  # for managing paths
-import requests  # for fetching the docs
 import zipfile  # for extracting the docs
-import io  # for reading the zip file
+from typing import Iterator
 import yaml  # for reading the metadata of doc files
 import re  # for cutting metadata out of doc headers
 
 import write
 import config
+import instrumentation
+import markup  # for cleaning up the docs
+import sources  # for fetching the docs
 
 try:
     from yaml import CLoader as Loader
@@ -15,23 +17,11 @@ except ImportError:
 
 
 METADATA_PATTERN = re.compile("---(.+?)---", re.DOTALL)
-SELFCLOSING_HTML_PATTERN = re.compile(r"<([^/]\w*)[^>]*/>", re.DOTALL)
-HTML_PATTERN = re.compile(r"<([^/]\w*)[^>]*>.*?</\1>", re.DOTALL)
-EXTRA_NEWLINES_PATTERN = re.compile(r"\n[\n\s]+", re.DOTALL)
-INLINE_LINKS_PATTERN = re.compile(r"\[(.*?)\]\(.*?\)", re.DOTALL)
-API_LINKING_WITH_NAME_PATTERN = re.compile(r"`[A-Z]\w*?\.[^\n]*?\|(.*?)`", re.DOTALL)
-API_LINKING_PATTERN = re.compile(r"`[A-Z]\w*?\.([^\n]*?)`", re.DOTALL)
 
-
-def fetch_tree_data():
-    data_res = requests.get(
-        "https://api.github.com/repos/Roblox/creator-docs/git/trees/main:content?recursive=true",
-        headers=config.GH_REQ_HEADERS,
-    )
-    data_res.raise_for_status()
-
-    data = data_res.json()
-    return data
+REPO = "Roblox/creator-docs"
+BRANCH = "main"
+# Archive paths are keyed under this root, whichever commit the archive is from
+ARCHIVE_ROOT = "creator-docs-main/"
 
 
 def is_path_allowed(path: str):
@@ -76,20 +66,7 @@ def get_document_metadata(filepath, document):
 
 
 def prepare_document_for_ingest(document):
-    # Remove metadata header (---...---)
-    document = METADATA_PATTERN.sub("", document)
-    # Remove html elements like <img /> and <video></video>
-    document = HTML_PATTERN.sub("", document)
-    document = SELFCLOSING_HTML_PATTERN.sub("", document)
-    # Remove links but keep the text [text](url)
-    document = INLINE_LINKS_PATTERN.sub(r"\1", document)
-    # Remove extra newlines
-    document = EXTRA_NEWLINES_PATTERN.sub("\n\n", document)
-    # Remove Roblox's custom API linking
-    document = API_LINKING_WITH_NAME_PATTERN.sub(r"`\1`", document)
-    document = API_LINKING_PATTERN.sub(r"`\1`", document)
-
-    return document
+    return markup.normalize_document(document)
 
 
 def get_document_sections(content, metadata):
@@ -114,32 +91,46 @@ def get_document_sections(content, metadata):
     return sections
 
 
-def get_documents():
-    data_res = requests.get(
-        "https://github.com/Roblox/creator-docs/archive/refs/heads/main.zip",
+def download_archive(sha: str) -> str:
+    """Download the creator-docs archive at a commit into the HTTP cache, and return its path."""
+    return sources.fetch(
+        f"https://github.com/{REPO}/archive/{sha}.zip",
         headers=config.GH_REQ_HEADERS,
+        name=f"{REPO}.zip",
     )
-    data_res.raise_for_status()
-    zipped = zipfile.ZipFile(io.BytesIO(data_res.content))
 
-    documents = {}
-    documentation_filepaths = [
-        path for path in zipped.namelist() if is_path_allowed(path)
-    ]
 
-    current_file = 0
+def read_documents(zipped: zipfile.ZipFile) -> Iterator[tuple[str, str]]:
+    count = 0
+    for member in zipped.namelist():
+        filepath = ARCHIVE_ROOT + member.split("/", 1)[-1]
+        if not is_path_allowed(filepath):
+            continue
+        count += 1
+        with instrumentation.timed("read", zipped.getinfo(member).file_size):
+            document = zipped.read(member).decode("utf-8")
+        yield filepath, document
+
+    print(f"Found {count} documents")
 
-    for filepath in documentation_filepaths:
-        current_file += 1
-        documents[filepath] = zipped.read(filepath).decode("utf-8")
 
-    zipped.close()
+def get_documents(
+    sha: str, zip_path: str | None = config.CREATOR_DOCS_ZIP
+) -> Iterator[tuple[str, str]]:
+    """Yield (path, content) of every allowed document at a commit, reading one file at a time.
 
-    print(f"Found {len(documents)} documents")
-    return documents
+    The archive is read from zip_path if given, otherwise from the downloaded archive.
+    """
+    with zipfile.ZipFile(zip_path or download_archive(sha)) as zipped:
+        yield from read_documents(zipped)
 
 
-def get_sha():
-    data = fetch_tree_data()
-    write.write_text(data["sha"], "build/docs-source-commit.txt")
-    return data["sha"]
+def get_sha(zip_path: str | None = config.CREATOR_DOCS_ZIP) -> str:
+    if zip_path is not None:
+        # GitHub archives store their commit SHA as the zip comment
+        with zipfile.ZipFile(zip_path) as zipped:
+            sha = zipped.comment.decode("utf-8") or "unknown"
+    else:
+        sha = sources.get_commit_sha(REPO, BRANCH)
+    write.write_text(sha, "build/docs-source-commit.txt")
+    return sha
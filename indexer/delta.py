@@ -0,0 +1,125 @@
+"""Delta releases: the changes from the previous release's index to this one.
+
+The previous release's index-vectors.bin (see shards) is downloaded to BASE_DIR
+before indexing. It records every entry's key and a hash of its title, type,
+content and embeddings, which is all that's needed to tell which entries were
+added, updated or removed. Entries keep their position from the previous release
+and new ones are appended, so a cached index.json can be patched by position:
+replace the updated entries, drop the removed ones and append the added ones.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import packed_index
+import shards
+from config import EMBEDDING_MODEL, INDEX_VERSION
+
+BASE_DIR = "build/previous"
+DELTA_PATH = "build/index-delta.json"
+
+
+def hash_entries(
+    index: list[dict], embeddings: np.ndarray, row_offsets: np.ndarray
+) -> list[str]:
+    """Return a hash of each entry's strings and float32 embedding rows."""
+    hashes = []
+    for document, entry in enumerate(index):
+        digest = hashlib.sha256()
+        for field in packed_index.STRING_FIELDS:
+            digest.update(str(entry.get(field, "")).encode("utf-8") + b"\0")
+        rows = embeddings[row_offsets[document] : row_offsets[document + 1]]
+        digest.update(np.ascontiguousarray(rows, dtype="<f4").tobytes())
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+def load_base(directory: str = BASE_DIR) -> tuple[dict | None, str | None]:
+    """Return the keys and hashes of the previous release's entries, or None and why there's no delta."""
+    path = os.path.join(directory, shards.VECTORS_FILE)
+    if not os.path.exists(path):
+        return None, f"there is no previous `{shards.VECTORS_FILE}`"
+    index = packed_index.PackedIndex(path)
+    if (index.header.get("embedding_model"), index.header.get("index_version")) != (
+        EMBEDDING_MODEL,
+        INDEX_VERSION,
+    ):
+        return None, "the embedding model or index version changed"
+    if "hash" not in index.fields:
+        return None, "the previous release doesn't record entry hashes"
+
+    release = None
+    if os.path.exists(os.path.join(directory, "release-tag.txt")):
+        with open(
+            os.path.join(directory, "release-tag.txt"), "r", encoding="utf-8"
+        ) as f:
+            release = f.read().strip() or None
+    with open(path, "rb") as f:
+        vectors_sha256 = hashlib.file_digest(f, "sha256").hexdigest()
+
+    documents = len(index.row_offsets) - 1
+    return {
+        "release": release,
+        "index_version": INDEX_VERSION,
+        "documents": documents,
+        "vectors_sha256": vectors_sha256,
+        "keys": [index.get_string(document, "key") for document in range(documents)],
+        "hashes": [index.get_string(document, "hash") for document in range(documents)],
+    }, None
+
+
+def order_entries(entries: dict[str, dict], base_keys: list[str]) -> dict[str, dict]:
+    """Return the entries with those in the base at their base order, followed by new ones."""
+    ordered = {key: entries[key] for key in base_keys if key in entries}
+    ordered.update((key, entry) for key, entry in entries.items() if key not in ordered)
+    return ordered
+
+
+def diff_index(entries: dict[str, dict], hashes: list[str], base: dict) -> dict:
+    """Return the delta from the base to the entries, which must be in order_entries order."""
+    positions = {key: position for position, key in enumerate(base["keys"])}
+    added, updated = [], []
+    for key, content_hash, entry in zip(entries, hashes, entries.values()):
+        if key not in positions:
+            added.append({"key": key, "entry": entry})
+        elif base["hashes"][positions[key]] != content_hash:
+            updated.append({"key": key, "position": positions[key], "entry": entry})
+    removed = [
+        {"key": key, "position": position}
+        for key, position in positions.items()
+        if key not in entries
+    ]
+    return {
+        "base": {
+            name: value
+            for name, value in base.items()
+            if name not in ("keys", "hashes")
+        },
+        "index_version": INDEX_VERSION,
+        "documents": len(entries),
+        "added": added,
+        "updated": updated,
+        "removed": removed,
+    }
+
+
+def apply_delta(index: list[dict], delta: dict) -> list[dict]:
+    """Return the base index.json entries patched with a delta."""
+    patched = list(index)
+    for change in delta["updated"]:
+        patched[change["position"]] = change["entry"]
+    removed = {change["position"] for change in delta["removed"]}
+    patched = [
+        entry for position, entry in enumerate(patched) if position not in removed
+    ]
+    patched.extend(change["entry"] for change in delta["added"])
+    return patched
+
+
+def write_delta(delta: dict, path: str = DELTA_PATH) -> int:
+    """Write the delta compactly, like index.json, and return its size in bytes."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(delta, f)
+    return os.path.getsize(path)
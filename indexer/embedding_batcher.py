@@ -0,0 +1,94 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from config import EMBEDDING_BATCH_LATENCY, EMBEDDING_BATCH_LIMIT
+
+
+class EmbeddingBatcher:
+    """Packs embedding inputs from many documents into full batches.
+
+    Document tasks submit texts and get back one future per text. A batch is sent
+    once EMBEDDING_BATCH_LIMIT inputs are queued, or once the oldest queued input has
+    waited for EMBEDDING_BATCH_LATENCY seconds, and each vector is routed back to the
+    future of the text it belongs to. Must be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        create_embeddings: Callable[[list[str]], Awaitable[list[list[float]]]],
+        batch_size: int = EMBEDDING_BATCH_LIMIT,
+        max_latency: float = EMBEDDING_BATCH_LATENCY,
+    ):
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.requests = 0
+        self.inputs = 0
+        self._create_embeddings = create_embeddings
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._in_flight: set[asyncio.Task] = set()
+
+    def submit(self, texts: list[str]) -> list[asyncio.Future]:
+        """Queue texts for embedding and return a future for each of their vectors."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._pending.append((text, future))
+            futures.append(future)
+
+        while len(self._pending) >= self.batch_size:
+            self._flush()
+
+        if len(self._pending) > 0 and self._timer is None:
+            self._timer = loop.call_later(self.max_latency, self._flush_all)
+
+        return futures
+
+    async def close(self):
+        """Send everything still queued and wait for in-flight batches to finish."""
+        self._flush_all()
+        while len(self._in_flight) > 0:
+            await asyncio.gather(*self._in_flight)
+
+    def _flush_all(self):
+        while len(self._pending) > 0:
+            self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch = self._pending[: self.batch_size]
+        self._pending = self._pending[self.batch_size :]
+
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+        if len(self._pending) > 0:
+            # The remaining inputs arrived later, so they get a fresh deadline
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_latency, self._flush_all
+            )
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        try:
+            embeddings = await self._create_embeddings(texts)
+            if len(embeddings) != len(texts):
+                raise ValueError(
+                    f"Expected {len(texts)} embeddings but got {len(embeddings)}"
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.requests += 1
+        self.inputs += len(texts)
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
@@ -0,0 +1,133 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, TypeVar
+
+T = TypeVar("T")
+
+# Upper bounds in seconds of the latency histogram buckets, the last bucket is everything slower
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SLOWEST_DOCUMENTS = 10
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if len(values) == 0:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def get_histogram(values: list[float]) -> dict:
+    """Return the count, sum, percentiles and bucket counts of a list of latencies."""
+    counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    for value in values:
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and value > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        counts[bucket] += 1
+    return {
+        "count": len(values),
+        "sum": sum(values),
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "max": max(values, default=0.0),
+        "buckets": [
+            {"le": bound, "count": count}
+            for bound, count in zip(LATENCY_BUCKETS + (None,), counts)
+        ],
+    }
+
+
+class StageStats:
+    """Throughput of a pipeline stage, to see which stage is the bottleneck.
+
+    Busy time adds up the time spent on each document, so it exceeds wall time
+    when the stage works on several documents at once.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.documents = 0
+        self.bytes = 0
+        self.busy = 0.0
+        self.durations: list[float] = []
+        self.started: float | None = None
+        self.finished: float | None = None
+        self._lock = threading.Lock()
+
+    def record(self, started: float, finished: float, size: int, busy: float):
+        """Record a document, with perf_counter times of when its work started and finished."""
+        with self._lock:
+            self.documents += 1
+            self.bytes += size
+            self.busy += busy
+            self.durations.append(finished - started)
+            self.started = (
+                started if self.started is None else min(self.started, started)
+            )
+            self.finished = (
+                finished if self.finished is None else max(self.finished, finished)
+            )
+
+    def get_wall_seconds(self) -> float:
+        if self.started is None:
+            return 0.0
+        return self.finished - self.started
+
+    def report(self) -> str:
+        wall = max(self.get_wall_seconds(), 1e-9)
+        return (
+            f"  {self.name}: {self.documents} documents ({self.bytes / 1e6:.1f} MB) in {wall:.1f}s, "
+            f"{self.documents / wall:.1f} documents/s, {self.bytes / 1e6 / wall:.2f} MB/s, "
+            f"{self.busy:.1f}s busy"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "documents": self.documents,
+            "bytes": self.bytes,
+            "wall_seconds": self.get_wall_seconds(),
+            "busy_seconds": self.busy,
+            "latency": get_histogram(self.durations),
+        }
+
+
+# Every stage of this run in the order they started, and the time each document took end to end
+stages: dict[str, StageStats] = {}
+stages_lock = threading.Lock()
+documents: list[tuple[float, str, int]] = []
+
+
+def get_stage(name: str) -> StageStats:
+    with stages_lock:
+        if name not in stages:
+            stages[name] = StageStats(name)
+        return stages[name]
+
+
+@contextmanager
+def timed(name: str, size: int = 0):
+    """Record the time spent in the block as one item of a stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        finished = time.perf_counter()
+        get_stage(name).record(started, finished, size, finished - started)
+
+
+async def measure(name: str, size: int, awaitable: Awaitable[T]) -> T:
+    """Await and record the time it took as one item of a stage, for use in asyncio.gather."""
+    with timed(name, size):
+        return await awaitable
+
+
+def record_document(key: str, size: int, seconds: float):
+    documents.append((seconds, key, size))
+
+
+def get_slowest_documents(count: int = SLOWEST_DOCUMENTS) -> list[dict]:
+    return [
+        {"key": key, "bytes": size, "seconds": seconds}
+        for seconds, key, size in sorted(documents, reverse=True)[:count]
+    ]
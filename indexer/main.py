@@ -1,33 +1,75 @@
 import asyncio
-import concurrent
-import concurrent.futures
 import json
 import os
 import re
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import date
-from typing import Any, TypedDict
+from typing import Iterable, Iterator, TypedDict
 
+import ann
 import api_reference
+import backends
+import cache
 import creator_docs
+import delta
+import embedding_batcher
+import instrumentation
+import manifest
+import model_client
+import packed_index
+import preprocessing
+import pruning
+import quantization
+import reduction
+import search
+import shards
 import write
 from config import (
-    EMBEDDING_BATCH_LIMIT,
+    ANN_NLIST,
+    ANN_NPROBE,
+    CREATOR_DOCS_ZIP,
+    DOCUMENT_CONCURRENCY,
+    EMBEDDING_CONCURRENCY,
     EMBEDDING_MODEL,
-    EMBEDDING_TOKEN_LIMIT,
+    EMBEDDING_REDUCED_DIMENSIONS,
+    EMBEDDING_REDUCTION,
+    INDEXER_BACKEND,
     INDEX_VERSION,
+    MODEL_PRICES,
+    PACKED_INDEX_DTYPE,
+    PRUNING_BOUNDS,
+    QUERY_INSTRUCTION,
+    QUESTION_CONCURRENCY,
+    QUANTIZATION_SCALES,
     QUESTION_MODEL,
+    QUESTION_PROMPT,
+    SUMMARY_CONCURRENCY,
     SUMMARY_MODEL,
-    TOGETHERAI_API_KEY,
+    SUMMARY_PROMPT,
 )
 from dotenv import find_dotenv, load_dotenv
-from together import Together
 from tqdm import tqdm
-from transformers import AutoTokenizer
 
 load_dotenv(find_dotenv())
 
-client = Together(api_key=TOGETHERAI_API_KEY)
+client = model_client.ModelClient(
+    backends.create_client,
+    concurrency={
+        SUMMARY_MODEL: SUMMARY_CONCURRENCY,
+        QUESTION_MODEL: QUESTION_CONCURRENCY,
+        EMBEDDING_MODEL: EMBEDDING_CONCURRENCY,
+    },
+    # The local stand-in models are free, so they're reported without a cost
+    prices=MODEL_PRICES if INDEXER_BACKEND == "together" else None,
+)
+# Results of the local stand-in models are kept apart from real ones
+llm_cache = cache.Cache(
+    cache.CACHE_PATH
+    if INDEXER_BACKEND == "together"
+    else f"build/cache/{INDEXER_BACKEND}.sqlite"
+)
 
 
 class IndexEntry(TypedDict, total=False):
@@ -37,82 +79,117 @@ class IndexEntry(TypedDict, total=False):
     embeddings: list[list[float]]
 
 
-tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+embedding_batchers: dict[str, embedding_batcher.EmbeddingBatcher] = {}
+
 
+def get_batcher(model: str) -> embedding_batcher.EmbeddingBatcher:
+    """Return the embedding batcher shared by all documents for a model."""
+    if model not in embedding_batchers:
 
-def count_tokens(text: str) -> int:
-    """Return the number of tokens in a string."""
-    tokenized_text_result = tokenizer(text)
-    return len(tokenized_text_result.get("input_ids", []))
+        async def create_embeddings(texts: list[str]) -> list[list[float]]:
+            return await client.embed(model, texts)
+
+        embedding_batchers[model] = embedding_batcher.EmbeddingBatcher(
+            create_embeddings
+        )
+    return embedding_batchers[model]
 
 
-def get_embeddings(texts: list[str], model: str = EMBEDDING_MODEL) -> list[list[float]]:
-    """Return the embeddings for a list of strings."""
+async def get_embeddings(
+    texts: list[str], model: str = EMBEDDING_MODEL
+) -> list[list[float]]:
+    """Return the embeddings for a list of strings that are within the embedding token limit."""
 
     if len(texts) == 0:
         print("Embedding inputs are empty")
         return []
 
-    # First, split up any strings that are over the embedding token limit
-    processed_texts = []
-    for text in texts:
-        text = text.replace("\n", " ")
-        if count_tokens(text) < EMBEDDING_TOKEN_LIMIT:
-            processed_texts.append(text)
-        else:
-            # Split by spaces, then combine as many as possible until the token limit is reached
-            words = text.split(" ")
-            chunk = []
-            while len(words) > 0:
-                next_word = words.pop(0)
-                if (
-                    count_tokens(" ".join(chunk) + " " + next_word)
-                    > EMBEDDING_TOKEN_LIMIT
-                ):
-                    processed_texts.append(" ".join(chunk))
-                    chunk = [next_word]
-                else:
-                    chunk.append(next_word)
-
-    # Then, split texts into batches of EMBEDDING_BATCH_LIMIT
-    batches = [
-        processed_texts[i : i + EMBEDDING_BATCH_LIMIT]
-        for i in range(0, len(processed_texts), EMBEDDING_BATCH_LIMIT)
-    ]
+    # First, reuse cached embeddings where possible. Cache access is blocking SQLite,
+    # so it runs off the event loop, once per document
+    cached_embeddings = await asyncio.to_thread(
+        llm_cache.get_many, "embedding", model, "", texts
+    )
+    # Each distinct text is embedded once, and its result is used for every occurrence
+    misses = list(
+        dict.fromkeys(
+            text
+            for text, embedding in zip(texts, cached_embeddings)
+            if embedding is None
+        )
+    )
+
+    # Then, queue the rest to be embedded in batches shared with other documents
+    futures = dict(zip(misses, get_batcher(model).submit(misses)))
+    await asyncio.gather(*futures.values(), return_exceptions=True)
 
-    # Finally, get the embeddings for each batch
     embeddings = []
-    for batch in batches:
+    created = {}
+    for text, embedding in zip(texts, cached_embeddings):
+        if embedding is not None:
+            embeddings.append(cache.unpack_floats(embedding))
+            continue
         try:
-            response = client.embeddings.create(input=batch, model=model)
-            embeddings.extend([result.embedding for result in response.data])
+            embedding = futures[text].result()
         except Exception as e:
             print(
-                batch,
+                text[:100],
                 "failed to create embeddings",
                 e,
             )
+            continue
+        created[text] = cache.pack_floats(embedding)
+        embeddings.append(embedding)
 
+    await asyncio.to_thread(
+        llm_cache.put_many, "embedding", model, "", list(created.items())
+    )
     return embeddings
 
 
-def load_documents() -> dict[str, str]:
-    documents = creator_docs.get_documents()
-    documents.update(api_reference.get_reference())
-    return documents
+def fetch_sources() -> dict[str, str]:
+    """Resolve the commit of every source, then download them all at those commits.
+
+    Requests run concurrently and land in the HTTP cache, where loading the documents
+    picks them up. Returns the commit SHAs, so the summary names exactly what was indexed.
+    """
+    with ThreadPoolExecutor() as pool:
+        docs_sha = pool.submit(creator_docs.get_sha)
+        api_sha = pool.submit(api_reference.get_sha)
+        shas = {"docs": docs_sha.result(), "api": api_sha.result()}
+
+        downloads = [
+            pool.submit(api_reference.get_api_dump, shas["api"]),
+            pool.submit(api_reference.get_api_docstrings, shas["api"]),
+        ]
+        if CREATOR_DOCS_ZIP is None:
+            downloads.append(pool.submit(creator_docs.download_archive, shas["docs"]))
+        for download in downloads:
+            download.result()
+
+    return shas
 
 
-def get_summary(content: str) -> str:
+def load_documents(shas: dict[str, str]) -> Iterator[tuple[str, str]]:
+    """Yield (key, content) of every document, reading the sources lazily."""
+    yield from creator_docs.get_documents(shas["docs"])
+    yield from api_reference.get_reference(shas["api"]).items()
+
+
+async def get_summary(content: str) -> str:
+    version = manifest.get_prompt_version(SUMMARY_PROMPT)
+    cached = await asyncio.to_thread(
+        llm_cache.get, "summary", SUMMARY_MODEL, version, content
+    )
+    if cached is not None:
+        return cached.decode("utf-8")
+
     print("Getting summary for", content[:100] + ("..." if len(content) > 100 else ""))
-    completion = client.chat.completions.create(
-        model=SUMMARY_MODEL,
-        messages=[
+    completion = await client.chat(
+        SUMMARY_MODEL,
+        [
             {
                 "role": "system",
-                "content": "You are a summary generator. "
-                "Your summary will be used to create vector embeddings for content to improve semantic searches. "
-                "When the user provides content, respond with a summary of the content. "
-                "Do NOT include any text other than the summary. Keep your summary to just a few sentences.",
+                "content": SUMMARY_PROMPT,
             },
             {
                 "role": "user",
@@ -120,24 +197,35 @@ def get_summary(content: str) -> str:
             },
         ],
     )
-    summary = completion.choices[0].message.content
-    return summary.strip()
+    summary = completion.choices[0].message.content.strip()
+    await asyncio.to_thread(
+        llm_cache.put,
+        "summary",
+        SUMMARY_MODEL,
+        version,
+        content,
+        summary.encode("utf-8"),
+    )
+    return summary
+
 
+async def get_questions(content: str) -> list[str]:
+    version = manifest.get_prompt_version(QUESTION_PROMPT)
+    cached = await asyncio.to_thread(
+        llm_cache.get, "questions", QUESTION_MODEL, version, content
+    )
+    if cached is not None:
+        return parse_questions(cached.decode("utf-8"))
 
-def get_questions(content: str) -> list[str]:
     print(
         "Getting questions for", content[:100] + ("..." if len(content) > 100 else "")
     )
-    completion = client.chat.completions.create(
-        model=QUESTION_MODEL,
-        messages=[
+    completion = await client.chat(
+        QUESTION_MODEL,
+        [
             {
                 "role": "system",
-                "content": "Your job is to come up with three varied questions that can be answered by the given documentation excerpt. "
-                "Your questions will be used to create vector embeddings to improve semantic searches. "
-                "For example, a documentation excerpt about animations can answer questions about how to make an NPC dance."
-                "When the user provides a documentation excerpt, respond with three relevant questions that can be answered by the excerpt. "
-                "Do NOT include any text other than the questions. Put each question on a new line.",
+                "content": QUESTION_PROMPT,
             },
             {
                 "role": "user",
@@ -145,7 +233,21 @@ def get_questions(content: str) -> list[str]:
             },
         ],
     )
-    questions = completion.choices[0].message.content.splitlines()
+    # Cache the raw reply so that changes to the parsing below don't need new completions
+    reply = completion.choices[0].message.content
+    await asyncio.to_thread(
+        llm_cache.put,
+        "questions",
+        QUESTION_MODEL,
+        version,
+        content,
+        reply.encode("utf-8"),
+    )
+    return parse_questions(reply)
+
+
+def parse_questions(reply: str) -> list[str]:
+    questions = reply.splitlines()
     # Strip "in Roblox" and "in Luau" and "in Roblox Studio" from the question text
     questions = [
         re.sub(
@@ -163,89 +265,250 @@ def get_questions(content: str) -> list[str]:
     return questions
 
 
-def process_document(
-    data: tuple[str, str],
-) -> IndexEntry:
-    key, document = data
-
-    embeddings_batch = []
-    metadata = creator_docs.get_document_metadata(filepath=key, document=document)
-    file_name = os.path.basename(key).replace(".md", "").replace(".yaml", "")
-    content = creator_docs.prepare_document_for_ingest(document=document)
-    lower_content = content.lower()
-
-    embeddings_batch.append(lower_content)
+async def process_document(
+    key: str, document: str, pool: ProcessPoolExecutor
+) -> tuple[IndexEntry, bool]:
+    """Return the index entry for a document, and whether every model call for it succeeded.
 
-    # Then, we break it into sections using ## headers, so that we get a dict of header content -> section content
-    sections = creator_docs.get_document_sections(
-        content=lower_content, metadata=metadata
+    Parsing, normalization and tokenizing are CPU-bound and run in the process pool,
+    so they don't hold the GIL while model requests are in flight.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    title, content, embeddings_batch, seconds = await loop.run_in_executor(
+        pool, preprocessing.prepare_document, key, document
+    )
+    # Busy time is the worker's CPU time, so waiting for a free worker doesn't count
+    instrumentation.get_stage("preprocessing").record(
+        started, time.perf_counter(), len(document), seconds
     )
 
-    for header in sections:
-        section_content = sections[header]
-
-        embeddable_content = (
-            "# "
-            + metadata.get("title", file_name)
-            + "\n## "
-            + metadata.get("description", "")
-            + "\n### "
-            + header
-            + "\n"
-            + section_content
-        )
-        embeddings_batch.append(embeddable_content.lower())
-
-    try:
-        embeddings_batch.append(get_summary(content).lower())
-    except Exception as e:
-        print("  Failed to get summary", e)
-
-    try:
-        questions = get_questions(content)
+    summary, questions = await asyncio.gather(
+        instrumentation.measure("summary", len(content), get_summary(content)),
+        instrumentation.measure("questions", len(content), get_questions(content)),
+        return_exceptions=True,
+    )
+    complete = True
+
+    generated = []
+    if isinstance(summary, Exception):
+        print("  Failed to get summary", summary)
+        complete = False
+    else:
+        generated.append(summary.lower())
+
+    if isinstance(questions, Exception):
+        print("  Failed to get questions", questions)
+        complete = False
+    else:
         for question in questions:
-            embeddings_batch.append(
-                "Represent this sentence for searching relevant passages: "
-                + question.lower()
+            generated.append(QUERY_INSTRUCTION + question.lower())
+
+    with instrumentation.timed("embedding", len(content)):
+        if len(generated) > 0:
+            embeddings_batch += await loop.run_in_executor(
+                pool, preprocessing.split_texts, generated
             )
-    except Exception as e:
-        print("  Failed to get questions", e)
+        embeddings = await get_embeddings(embeddings_batch)
+    if len(embeddings) < len(embeddings_batch):
+        complete = False
+    instrumentation.record_document(key, len(document), time.perf_counter() - started)
 
-    return {
-        "title": metadata.get("title", file_name),
+    entry: IndexEntry = {
+        "title": title,
         "content": content,
-        "embeddings": get_embeddings(embeddings_batch),
+        "embeddings": embeddings,
     }
+    return entry, complete
+
+
+async def index_documents(
+    documents: Iterable[tuple[str, str]],
+    previous: dict[str, dict],
+    journal: manifest.Journal,
+) -> tuple[dict[str, IndexEntry], dict[str, str], set[str]]:
+    """Process new and changed documents as they are read, reusing previous entries for the rest.
+
+    Documents are read in a worker thread, so reading overlaps with processing. At most
+    DOCUMENT_CONCURRENCY changed documents are in flight, and the next document is only
+    read once one of them finishes, so memory stays flat as the source grows. Each
+    complete entry is written to the journal as soon as it finishes, so an interrupted
+    run can resume.
+    """
+    processed = {}
+    incomplete = set()
+
+    async def process(key: str, document: str):
+        try:
+            entry, complete = await process_document(key, document, pool)
+        finally:
+            in_flight.release()
+        processed[key] = entry
+        if not complete:
+            incomplete.add(key)
+        elif len(entry["embeddings"]) > 0:
+            journal.append(key, hashes[key], entry)
+        progress.update(1)
+
+    # Acquired before each read, so only DOCUMENT_CONCURRENCY raw documents are held at once
+    in_flight = asyncio.Semaphore(DOCUMENT_CONCURRENCY)
+    hashes = {}
+    tasks = []
+    documents = iter(documents)
+    with preprocessing.create_pool() as pool, tqdm(
+        desc="Processing documents", total=0, file=sys.stdout
+    ) as progress:
+        while True:
+            await in_flight.acquire()
+            item = await asyncio.to_thread(next, documents, None)
+            if item is None:
+                in_flight.release()
+                break
+            key, document = item
+            hashes[key] = manifest.hash_document(document)
+            if previous.get(key, {}).get("hash") != hashes[key]:
+                tasks.append(asyncio.create_task(process(key, document)))
+                progress.total += 1
+                progress.refresh()
+            else:
+                in_flight.release()
+
+        changed, unchanged, removed = manifest.diff_documents(hashes, previous)
+        progress.write(
+            f"{len(changed)} new or changed documents, {len(unchanged)} unchanged, {len(removed)} removed"
+        )
+        await asyncio.gather(*tasks)
 
+    for batcher in embedding_batchers.values():
+        await batcher.close()
+        print(
+            f"Embedded {batcher.inputs} inputs in {batcher.requests} batched requests"
+        )
 
-def index_documents(documents: dict[str, Any]) -> list[IndexEntry]:
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        results = list(
-            tqdm(
-                executor.map(
-                    process_document,
-                    documents.items(),
-                ),
-                desc="Processing documents",
-                total=len(documents),
-                file=sys.stdout,
-            )
+    # Keep the same order as the source documents so that output is stable between runs
+    entries: dict[str, IndexEntry] = {}
+    for key in hashes:
+        if key in processed:
+            entries[key] = processed[key]
+        else:
+            entries[key] = previous[key]["entry"]
+
+    if len(incomplete) > 0:
+        print(
+            f"{len(incomplete)} documents are incomplete and will be retried next run"
         )
 
-    return results
+    return entries, hashes, incomplete
 
 
-def output_results(index: list[IndexEntry]):
+def output_results(entries: dict[str, IndexEntry], shas: dict[str, str]):
+    # Keep the previous release's order, so its index.json can be patched by position
+    base, no_delta_reason = delta.load_base()
+    if base is not None:
+        entries = delta.order_entries(entries, base["keys"])
+    index = list(entries.values())
     json.dump(index, open("build/index.json", "w"))
 
     embedding_dimensions = len(index[0]["embeddings"][0])
 
+    header, arrays = packed_index.pack_index(index)
+    entry_hashes = delta.hash_entries(
+        index, arrays["embeddings"], arrays["row_offsets"]
+    )
+    header.update(
+        embedding_model=EMBEDDING_MODEL,
+        index_version=INDEX_VERSION,
+    )
+
+    # Optionally reduce the dimensions of the packed embeddings, storing the projection for queries
+    reduction_note = ""
+    if EMBEDDING_REDUCTION is not None:
+        projection = reduction.fit_projection(
+            arrays["embeddings"], EMBEDDING_REDUCTION, EMBEDDING_REDUCED_DIMENSIONS
+        )
+        arrays["embeddings"] = reduction.project(arrays["embeddings"], projection)
+        arrays["projection"] = projection
+        header["dimensions"] = len(projection)
+        header["reduction"] = {
+            "method": EMBEDDING_REDUCTION,
+            "source_dimensions": embedding_dimensions,
+        }
+        reduction_note = (
+            f" reduced to {len(projection)} dimensions by {EMBEDDING_REDUCTION}"
+        )
+
+    # Build the approximate nearest neighbor index and measure it against exact search
+    ann_arrays = ann.build_ivf(arrays["embeddings"], nlist=ANN_NLIST)
+    search_index = search.SearchIndex(
+        arrays["embeddings"], arrays["row_offsets"], index.__getitem__
+    )
+    ann_report = ann.recall_report(
+        search_index, ann.IVFIndex.from_arrays(search_index, ann_arrays)
+    )
+    write.write_json(ann_report, "build/ann-report.json")
+    ann_recall = next(
+        (
+            result["recall"]
+            for result in ann_report["nprobe"]
+            if result["nprobe"] == ANN_NPROBE
+        ),
+        None,
+    )
+    header["ann"] = {"nlist": len(ann_arrays["ann_centroids"]), "nprobe": ANN_NPROBE}
+
+    # Quantized copies for scoring, with the full precision embeddings used to re-rank
+    quantized_arrays = quantization.build_quantized(
+        arrays["embeddings"], QUANTIZATION_SCALES
+    )
+    quantization_report = quantization.quantization_report(
+        search_index, quantized_arrays, QUANTIZATION_SCALES
+    )
+    write.write_json(quantization_report, "build/quantization-report.json")
+    header["quantization"] = {"int8_scales": QUANTIZATION_SCALES}
+
+    # Optional per-document bounds, so exact search can skip documents that can't make the top k
+    bounds_arrays = {}
+    pruning_note = "\n\nPer-document bounds for pruned exact search aren't included, since they rarely prune enough to be faster than scoring every embedding (see `PRUNING_BOUNDS`)."
+    if PRUNING_BOUNDS:
+        bounds_arrays = pruning.build_bounds(
+            arrays["embeddings"], arrays["row_offsets"]
+        )
+        pruning_report = pruning.pruning_report(
+            search_index,
+            pruning.BoundedSearchIndex.from_arrays(search_index, bounds_arrays),
+        )
+        write.write_json(pruning_report, "build/pruning-report.json")
+        pruned = pruning_report["thresholds"][-1]
+        pruning_note = f"""
+
+Every document also has a bounding cone around its embeddings, so exact search can skip documents that can't make the top {pruning_report['k']}. At relevance threshold {pruned['threshold']}, {pruned['pruned_mean']:.0f} of {pruning_report['documents']} documents are pruned per query on average, taking {pruned['latency_ms']:.1f} ms per query against {pruned['exact_latency_ms']:.1f} ms for a full scan, see `pruning-report.json`."""
+
+    arrays["embeddings"] = arrays["embeddings"].astype(PACKED_INDEX_DTYPE)
+    header["dtype"] = PACKED_INDEX_DTYPE
+    packed_index.write_sections(
+        "build/index.bin",
+        header,
+        {**arrays, **ann_arrays, **quantized_arrays, **bounds_arrays},
+    )
+    content_manifest = shards.write_artifacts(entries, entry_hashes, header, arrays)
+    content_bytes = sum(shard["bytes"] for shard in content_manifest["shards"])
+
+    if base is not None:
+        index_delta = delta.diff_index(entries, entry_hashes, base)
+        delta_bytes = delta.write_delta(index_delta)
+        delta_note = f"""`index-delta.json` ({delta_bytes / 1e6:.1f} MB, against {os.path.getsize("build/index.json") / 1e6:.1f} MB for `index.json`) updates the index of the base release `{base['release'] or 'unknown'}` ({base['documents']} entries, `index-vectors.bin` SHA-256 `{base['vectors_sha256'][:12]}`) to this one: {len(index_delta['added'])} entries added, {len(index_delta['updated'])} updated and {len(index_delta['removed'])} removed. Entries keep their position from the base, so a cached copy is patched by replacing the updated entries at their positions, dropping the removed ones and appending the added ones."""
+    else:
+        # Don't leave an older delta around to be published against the wrong base
+        if os.path.exists(delta.DELTA_PATH):
+            os.remove(delta.DELTA_PATH)
+        delta_note = f"No `index-delta.json` was made because {no_delta_reason}, so clients need the full index."
+
     write.write_text(
         f"""# Roblox Documentation Index
 
 Generated on {date.today()} from:
-- https://github.com/Roblox/creator-docs @ {creator_docs.get_sha()[:7]}
-- https://github.com/MaximumADHD/Roblox-Client-Tracker/tree/roblox/api-docs @ {api_reference.get_sha()[:7]}
+- https://github.com/Roblox/creator-docs @ {shas['docs'][:7]}
+- https://github.com/MaximumADHD/Roblox-Client-Tracker/tree/roblox/api-docs @ {shas['api'][:7]}
 - Embedding Model: {EMBEDDING_MODEL} ({embedding_dimensions} dimensions)
 - Summary Model: {SUMMARY_MODEL}
 - Question Model: {QUESTION_MODEL}
@@ -253,23 +516,126 @@ Generated on {date.today()} from:
 
 ## Embeddings
 
-With those files, {len(index)} index entries were created with {sum([len(entry['embeddings']) for entry in index])} embeddings total. The embeddings, along with content and metadata, can be found in `index.json`.""",
+With those files, {len(index)} index entries were created with {sum([len(entry['embeddings']) for entry in index])} embeddings total. The embeddings, along with content and metadata, can be found in `index.json`, and in the memory-mappable `index.bin` ({PACKED_INDEX_DTYPE} embeddings{reduction_note}).
+
+`index.bin` also contains an IVF index over all embeddings with {header['ann']['nlist']} lists. At nprobe {ANN_NPROBE} it has a recall@{ann_report['k']} of {ann_recall if ann_recall is not None else float('nan'):.1%} against exact search, see `ann-report.json` for other settings.
+
+It also contains an int8 copy of the embeddings (per-{QUANTIZATION_SCALES} scales) for quantized search with full precision re-ranking, which reads a quarter of the bytes per query ({quantization_report['int8']['latency_ms']:.1f} ms per query here, against {quantization_report['float32']['latency_ms']:.1f} ms for exact search). float16 is only a storage format that halves the size of `index.bin` (set `PACKED_INDEX_DTYPE`), converted to float32 once at load:
+
+| Matrix | Size | Recall@{quantization_report['k']} |
+| --- | --- | --- |
+| float32 | {quantization_report['float32']['bytes'] / 1e6:.1f} MB | 100% |
+| int8 | {quantization_report['int8']['bytes'] / 1e6:.1f} MB | {quantization_report['int8']['recall']:.1%} |
+| float16 | {quantization_report['float16']['bytes'] / 1e6:.1f} MB | {quantization_report['float16']['recall']:.1%} |{pruning_note}
+
+## Sharded Artifacts
+
+For clients that only load what they return, `index-vectors.bin` ({content_manifest['vectors']['bytes'] / 1e6:.1f} MB) has the embeddings with each entry's key, title, type and content hash, and the content is split into {len(content_manifest['shards'])} gzip shards of {content_manifest['shard_documents']} entries ({content_bytes / 1e6:.1f} MB total), addressed by entry position. `content-manifest.json` lists them with their sizes and SHA-256 hashes.
+
+## Delta
+
+{delta_note}""",
         "build/summary.md",
     )
 
 
+def get_run_report(
+    shas: dict[str, str],
+    entries: dict[str, IndexEntry],
+    incomplete: set[str],
+    seconds: float,
+) -> dict:
+    """Return the timings, model usage and cost of this run, for build/run-report.json."""
+    models = client.to_dict()
+    costs = [
+        model["cost_usd"] for model in models.values() if model["cost_usd"] is not None
+    ]
+    return {
+        "date": str(date.today()),
+        "seconds": seconds,
+        "sources": shas,
+        "documents": {
+            "total": len(entries),
+            "processed": instrumentation.get_stage("preprocessing").documents,
+            "incomplete": len(incomplete),
+        },
+        "stages": {
+            name: stats.to_dict() for name, stats in instrumentation.stages.items()
+        },
+        "models": models,
+        "cost_usd": sum(costs) if len(costs) > 0 else None,
+        "cache": llm_cache.stats,
+        "slowest_documents": instrumentation.get_slowest_documents(),
+    }
+
+
+def format_run_report(report: dict) -> str:
+    """Return the run report as markdown tables for summary.md."""
+    lines = [
+        "",
+        "",
+        "## Run",
+        "",
+        f"This run processed {report['documents']['processed']} of {report['documents']['total']} documents in {report['seconds']:.0f}s, "
+        + (
+            f"with an estimated model cost of ${report['cost_usd']:.3f}. "
+            if report["cost_usd"] is not None
+            else "without a model cost estimate for this backend. "
+        )
+        + "See `run-report.json` for latency histograms and the slowest documents.",
+        "",
+        "| Stage | Items | Wall | Busy | p50 | p95 |",
+        "| --- | --- | --- | --- | --- | --- |",
+    ]
+    for name, stage in report["stages"].items():
+        lines.append(
+            f"| {name} | {stage['documents']} | {stage['wall_seconds']:.1f}s | {stage['busy_seconds']:.1f}s "
+            f"| {stage['latency']['p50']:.2f}s | {stage['latency']['p95']:.2f}s |"
+        )
+    lines += [
+        "",
+        "| Model | Calls | Failures | Prompt tokens | Completion tokens | p50 | p95 | Cost |",
+        "| --- | --- | --- | --- | --- | --- | --- | --- |",
+    ]
+    for name, model in report["models"].items():
+        cost = "-" if model["cost_usd"] is None else f"${model['cost_usd']:.3f}"
+        lines.append(
+            f"| {name} | {model['calls']} | {model['failures']} | {model['prompt_tokens']} | {model['completion_tokens']} "
+            f"| {model['latency']['p50']:.2f}s | {model['latency']['p95']:.2f}s | {cost} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
 async def main():
     if not os.path.exists("build"):
         os.makedirs("build")
+    started = time.perf_counter()
 
     # Load
-    documents = load_documents()
+    with instrumentation.timed("fetch"):
+        shas = await asyncio.to_thread(fetch_sources)
+    documents = load_documents(shas)
+    # Documents finished by an interrupted run count as indexed, on top of the last finished run
+    journal = manifest.Journal()
+    previous = {**manifest.load_manifest(), **journal.load()}
 
     # Process
-    index = index_documents(documents)
+    entries, hashes, incomplete = await index_documents(documents, previous, journal)
 
     # Save
-    output_results(index)
+    with instrumentation.timed("output"):
+        output_results(entries, shas)
+        manifest.save_manifest(hashes, entries, incomplete)
+    journal.remove()
+    print("Pipeline stages")
+    for stats in instrumentation.stages.values():
+        print(stats.report())
+    print(client.report())
+    print(llm_cache.report())
+
+    report = get_run_report(shas, entries, incomplete, time.perf_counter() - started)
+    write.write_json(report, "build/run-report.json")
+    write.append_text(format_run_report(report), "build/summary.md")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+import hashlib  # for hashing document contents
+import json
+import os
+
+import config
+
+MANIFEST_PATH = "build/manifest.json"
+JOURNAL_PATH = "build/journal.jsonl"
+
+
+def hash_document(document: str) -> str:
+    """Return a stable content hash for a source document."""
+    return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
+
+def get_prompt_version(prompt: str) -> str:
+    """Return a short version id for a prompt, so cached results are invalidated when it changes."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def get_fingerprint() -> dict[str, str]:
+    """Return the settings that every manifest entry depends on.
+
+    If any of these change, previously indexed entries are no longer comparable
+    with new ones and everything needs to be reprocessed.
+    """
+    return {
+        "index_version": config.INDEX_VERSION,
+        "backend": config.INDEXER_BACKEND,
+        "embedding_model": config.EMBEDDING_MODEL,
+        "summary_model": config.SUMMARY_MODEL,
+        "question_model": config.QUESTION_MODEL,
+        "summary_prompt": get_prompt_version(config.SUMMARY_PROMPT),
+        "question_prompt": get_prompt_version(config.QUESTION_PROMPT),
+        "embedding_token_limit": str(config.EMBEDDING_TOKEN_LIMIT),
+    }
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict[str, dict]:
+    """Load the manifest of a previous run, keyed by document key.
+
+    Returns an empty manifest if there is no previous run or if it was produced
+    with different settings.
+    """
+    if not os.path.exists(path):
+        print("No previous manifest found, indexing all documents")
+        return {}
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    if data.get("fingerprint") != get_fingerprint():
+        print("Previous manifest was built with different settings, ignoring it")
+        return {}
+
+    return data.get("documents", {})
+
+
+def save_manifest(
+    hashes: dict[str, str],
+    entries: dict[str, dict],
+    incomplete: set[str] | None = None,
+    path: str = MANIFEST_PATH,
+):
+    """Save the content hash and index entry of every successfully indexed document."""
+    documents = {}
+    for key, entry in entries.items():
+        # Entries that failed to fully process are left out so that the next run retries them
+        if (incomplete and key in incomplete) or len(entry.get("embeddings", [])) == 0:
+            continue
+        documents[key] = {
+            "hash": hashes[key],
+            "entry": entry,
+        }
+
+    print(f"Writing {path}")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "fingerprint": get_fingerprint(),
+                "documents": documents,
+            },
+            f,
+        )
+
+
+def diff_documents(
+    hashes: dict[str, str], manifest: dict[str, dict]
+) -> tuple[list[str], list[str], list[str]]:
+    """Split document keys into changed (new or modified), unchanged and removed keys."""
+    changed = []
+    unchanged = []
+    for key, content_hash in hashes.items():
+        previous = manifest.get(key)
+        if previous is not None and previous.get("hash") == content_hash:
+            unchanged.append(key)
+        else:
+            changed.append(key)
+
+    removed = [key for key in manifest if key not in hashes]
+
+    return changed, unchanged, removed
+
+
+class Journal:
+    """Appends each completed document to a JSONL file as soon as it finishes.
+
+    The first line is the fingerprint, then each line is {"key", "hash", "entry"}.
+    If a run is interrupted, the next one loads the journal and skips the documents
+    already in it. Entries survive the JSON round trip unchanged, so the final output
+    is the same as that of an uninterrupted run. The journal is removed once the
+    manifest of a finished run has been saved.
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH):
+        self.path = path
+        self._file = None
+
+    def load(self) -> dict[str, dict]:
+        """Return the documents completed by an interrupted run, in the manifest format.
+
+        A torn last line from a crash mid-write is cut off, so appending can resume after it.
+        """
+        if not os.path.exists(self.path):
+            return {}
+
+        documents = {}
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for i, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                if i == 0:
+                    if record.get("fingerprint") != get_fingerprint():
+                        print(
+                            "Journal was written with different settings, ignoring it"
+                        )
+                        return {}
+                else:
+                    documents[record["key"]] = {
+                        "hash": record["hash"],
+                        "entry": record["entry"],
+                    }
+                valid_bytes += len(line)
+
+        if valid_bytes == 0:
+            return {}
+        with open(self.path, "r+b") as f:
+            f.truncate(valid_bytes)
+        self._file = open(self.path, "a", encoding="utf-8")
+        print(f"Resuming {len(documents)} documents from {self.path}")
+        return documents
+
+    def append(self, key: str, content_hash: str, entry: dict):
+        """Durably record a completed document before moving on."""
+        if self._file is None:
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._write({"fingerprint": get_fingerprint()})
+        self._write({"key": key, "hash": content_hash, "entry": entry})
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Close and delete the journal, once everything in it is in the manifest."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
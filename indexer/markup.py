@@ -0,0 +1,321 @@
+"""Markup normalization shared by the creator docs and the API reference.
+
+Every pass gives exactly the output of the regex substitution it replaces (noted
+on each function), but runs in linear time. The regexes used lazy matches up to a
+backreference, which backtrack over the rest of the page for every unclosed tag.
+Here every "next occurrence" search goes through a Finder, which never rescans text.
+"""
+
+import re  # only for linear-time pieces: word and whitespace runs
+from bisect import bisect_left
+
+WORD_PATTERN = re.compile(r"\w*")
+EXTRA_NEWLINES_PATTERN = re.compile(r"\n[\n\s]+")
+
+ENTITIES = {
+    "&mdash;": "—",
+    "&ndash;": "–",
+    "&nbsp;": " ",
+    "&quot;": '"',
+    "&apos;": "'",
+    "&lt;": "<",
+    "&gt;": ">",
+    "&amp;": "&",
+}
+LIST_TAGS = {
+    "<li>": "- ",
+    "</li>": "\n",
+    "<ul>": "\n",
+    "</ul>": "\n",
+}
+INLINE_TAGS = (
+    ("strong", "**"),
+    ("em", "*"),
+    ("code", "`"),
+)
+
+
+class Finder:
+    """Finds the next occurrence of a substring at or after a position.
+
+    Results are reused while the position doesn't pass them, so a scan with
+    non-decreasing positions reads the text once.
+    """
+
+    def __init__(self, text: str, sub: str):
+        self.text = text
+        self.sub = sub
+        self.start = len(text) + 1
+        self.position = -1
+
+    def find(self, start: int) -> int:
+        if start >= self.start and (self.position == -1 or start <= self.position):
+            return self.position
+        self.start = start
+        self.position = self.text.find(self.sub, start)
+        return self.position
+
+
+def strip_metadata(text: str) -> str:
+    """Remove ---...--- blocks, like re.sub("---(.+?)---", "", text, flags=re.DOTALL)."""
+    dashes = Finder(text, "---")
+    parts = []
+    last = 0
+    start = dashes.find(0)
+    while start != -1:
+        end = dashes.find(start + 4)
+        if end == -1:
+            break
+        parts.append(text[last:start])
+        last = end + 3
+        start = dashes.find(last)
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def index_closing_tags(text: str) -> dict[str, list[int]]:
+    """Return the positions of every closing tag </name>, by name.
+
+    A name is one character other than / followed by word characters, the same
+    shape as the names that opening tags capture.
+    """
+    closing = {}
+    start = text.find("</")
+    while start != -1:
+        name_start = start + 2
+        if name_start < len(text) and text[name_start] != "/":
+            name_end = WORD_PATTERN.match(text, name_start + 1).end()
+            if name_end < len(text) and text[name_end] == ">":
+                closing.setdefault(text[name_start:name_end], []).append(start)
+        start = text.find("</", start + 1)
+    return closing
+
+
+def strip_elements(text: str) -> str:
+    """Remove elements with their content, like re.sub(r"<([^/]\\w*)[^>]*>.*?</\\1>", "", text, flags=re.DOTALL).
+
+    The tag name is the first character and then as many word characters as have a
+    matching closing tag, longest first, which is the order the regex tries them in.
+    """
+    closing = index_closing_tags(text)
+    # Only names as long as some closing tag's name can match, so only try those lengths
+    name_lengths = sorted({len(name) for name in closing}, reverse=True)
+    tag_ends = Finder(text, ">")
+    parts = []
+    last = 0
+    start = text.find("<")
+    while start != -1:
+        end = -1
+        if start + 1 < len(text) and text[start + 1] != "/":
+            tag_end = tag_ends.find(start + 2)
+            if tag_end == -1:
+                break
+            word_end = WORD_PATTERN.match(text, start + 2).end()
+            for name_length in name_lengths:
+                name_end = start + 1 + name_length
+                if name_end > word_end:
+                    continue
+                positions = closing.get(text[start + 1 : name_end])
+                if positions is None:
+                    continue
+                i = bisect_left(positions, tag_end + 1)
+                if i < len(positions):
+                    end = positions[i] + name_end - start + 2
+                    break
+
+        if end == -1:
+            start = text.find("<", start + 1)
+            continue
+        parts.append(text[last:start])
+        last = end
+        start = text.find("<", last)
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def strip_self_closing(text: str) -> str:
+    """Remove self-closing tags, like re.sub(r"<([^/]\\w*)[^>]*/>", "", text, flags=re.DOTALL)."""
+    tag_ends = Finder(text, ">")
+    parts = []
+    last = 0
+    start = text.find("<")
+    while start != -1:
+        if start + 1 < len(text) and text[start + 1] != "/":
+            tag_end = tag_ends.find(start + 2)
+            if tag_end == -1:
+                break
+            if tag_end >= start + 3 and text[tag_end - 1] == "/":
+                parts.append(text[last:start])
+                last = tag_end + 1
+                start = text.find("<", last)
+                continue
+        start = text.find("<", start + 1)
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def unwrap_links(text: str) -> str:
+    """Replace [text](url) with text, like re.sub(r"\\[(.*?)\\]\\(.*?\\)", r"\\1", text, flags=re.DOTALL)."""
+    middles = Finder(text, "](")
+    link_ends = Finder(text, ")")
+    parts = []
+    last = 0
+    start = text.find("[")
+    while start != -1:
+        middle = middles.find(start + 1)
+        if middle == -1:
+            break
+        end = link_ends.find(middle + 2)
+        if end == -1:
+            break
+        parts.append(text[last:start])
+        parts.append(text[start + 1 : middle])
+        last = end + 1
+        start = text.find("[", last)
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def collapse_newlines(text: str) -> str:
+    """Replace runs of blank lines with a single blank line."""
+    return EXTRA_NEWLINES_PATTERN.sub("\n\n", text)
+
+
+def unwrap_api_links(text: str, named: bool) -> str:
+    """Replace Roblox API links with their display text.
+
+    With named, `Class.Member|name` becomes `name`, like
+    re.sub(r"`[A-Z]\\w*?\\.[^\\n]*?\\|(.*?)`", r"`\\1`", text, flags=re.DOTALL).
+    Otherwise `Class.Member` becomes `Member`, like
+    re.sub(r"`[A-Z]\\w*?\\.([^\\n]*?)`", r"`\\1`", text, flags=re.DOTALL).
+    """
+    newlines = Finder(text, "\n")
+    pipes = Finder(text, "|")
+    ticks = Finder(text, "`")
+    parts = []
+    last = 0
+    start = text.find("`")
+    while start != -1:
+        match = None
+        if start + 1 < len(text) and "A" <= text[start + 1] <= "Z":
+            dot = WORD_PATTERN.match(text, start + 2).end()
+            if dot < len(text) and text[dot] == ".":
+                newline = newlines.find(dot + 1)
+                if named:
+                    pipe = pipes.find(dot + 1)
+                    if pipe != -1 and (newline == -1 or pipe < newline):
+                        end = ticks.find(pipe + 1)
+                        if end != -1:
+                            match = (pipe + 1, end)
+                else:
+                    end = ticks.find(dot + 1)
+                    if end != -1 and (newline == -1 or end < newline):
+                        match = (dot + 1, end)
+
+        if match is None:
+            start = text.find("`", start + 1)
+            continue
+        group_start, end = match
+        parts.append(text[last:start])
+        parts.append("`" + text[group_start:end] + "`")
+        last = end + 1
+        start = text.find("`", last)
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def replace_tokens(text: str, replacements: dict[str, str], marker: str) -> str:
+    """Replace every occurrence of the keys, which all start with marker, in one pass.
+
+    Matches the replacements applied one after another with str.replace, because
+    no replacement can form a key together with the text around it.
+    """
+    parts = []
+    last = 0
+    start = text.find(marker)
+    while start != -1:
+        for token, replacement in replacements.items():
+            if text.startswith(token, start):
+                parts.append(text[last:start])
+                parts.append(replacement)
+                last = start + len(token)
+                break
+        start = text.find(marker, max(last, start + 1))
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def decode_entities(text: str) -> str:
+    """Replace the HTML entities used in the API docs with their characters."""
+    return replace_tokens(text, ENTITIES, "&")
+
+
+def replace_list_tags(text: str) -> str:
+    """Replace <li> with "- " and turn the other list tags into newlines."""
+    return replace_tokens(text, LIST_TAGS, "<")
+
+
+def convert_inline_tag(text: str, tag: str, markdown: str) -> str:
+    """Convert <tag>...</tag> on a single line to markdown, like re.sub(r"<tag>(.*?)</tag>", ...)."""
+    opening = f"<{tag}>"
+    closing = f"</{tag}>"
+    start = text.find(opening)
+    if start == -1:
+        return text
+    closings = Finder(text, closing)
+    newlines = Finder(text, "\n")
+    parts = []
+    last = 0
+    while start != -1:
+        content_start = start + len(opening)
+        end = closings.find(content_start)
+        if end == -1:
+            break
+        newline = newlines.find(content_start)
+        if newline != -1 and newline < end:
+            start = text.find(opening, start + 1)
+            continue
+        parts.append(text[last:start])
+        parts.append(markdown + text[content_start:end] + markdown)
+        last = end + len(closing)
+        start = text.find(opening, last)
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def convert_inline_tags(text: str) -> str:
+    """Convert <strong>, <em> and <code> to markdown bold, italics and code."""
+    if "<" not in text:
+        return text
+    for tag, markdown in INLINE_TAGS:
+        text = convert_inline_tag(text, tag, markdown)
+    return text
+
+
+def normalize_document(document: str) -> str:
+    """Clean a creator docs markdown file for ingest."""
+    # Remove metadata header (---...---)
+    document = strip_metadata(document)
+    # Remove html elements like <img /> and <video></video>
+    document = strip_elements(document)
+    document = strip_self_closing(document)
+    # Remove links but keep the text [text](url)
+    document = unwrap_links(document)
+    # Remove extra newlines
+    document = collapse_newlines(document)
+    # Remove Roblox's custom API linking
+    document = unwrap_api_links(document, named=True)
+    document = unwrap_api_links(document, named=False)
+    return document
+
+
+def normalize_api_document(document: str) -> str:
+    """Clean an API reference document for ingest."""
+    # Replace escaped characters with their actual characters such as &mdash;
+    document = decode_entities(document)
+    # Replace <li></li> with - and <ul></ul> with \n
+    document = replace_list_tags(document)
+    # Remove html elements like <img /> and <video></video>
+    document = strip_elements(document)
+    document = strip_self_closing(document)
+    return document
@@ -0,0 +1,273 @@
+import asyncio
+import email.utils  # for parsing HTTP dates in Retry-After
+import random
+import time
+from typing import Any, Awaitable, Callable
+
+import instrumentation
+from config import MAX_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+THROTTLED_STATUS_CODES = {429, 503}
+
+
+class AdaptiveLimiter:
+    """Limits concurrent requests to a model, adapting the limit with AIMD.
+
+    Every success raises the limit by 1/limit, so it grows by roughly one per
+    round trip of requests (additive increase), up to max_limit. Being throttled
+    halves it (multiplicative decrease), at most once per round trip so that a
+    burst of 429s from the same window only counts once.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.decreases = 0
+        self._condition = asyncio.Condition()
+        self._last_decrease = 0.0
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_throttled(self, latency: float):
+        now = time.monotonic()
+        if now - self._last_decrease < latency:
+            return
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit / 2)
+        self.decreases += 1
+
+
+class ModelStats:
+    """Per-model request counters and latencies for the end of run report."""
+
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.retried_calls = 0
+        self.failures = 0
+        self.errors: dict[str, int] = {}
+        self.latencies: list[float] = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record_usage(self, response: Any):
+        """Add the token usage reported in a response, if the endpoint reports it."""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        self.prompt_tokens += getattr(usage, "prompt_tokens", None) or 0
+        self.completion_tokens += getattr(usage, "completion_tokens", None) or 0
+
+    def get_cost(self, prices: tuple[float, float] | None) -> float | None:
+        """Return the cost in USD of the tokens used, given prices per million input and output tokens."""
+        if prices is None:
+            return None
+        return (
+            self.prompt_tokens * prices[0] + self.completion_tokens * prices[1]
+        ) / 1e6
+
+    def error_rate(self) -> float:
+        attempts = len(self.latencies) + sum(self.errors.values())
+        return sum(self.errors.values()) / attempts if attempts > 0 else 0.0
+
+    def latency_percentile(self, percentile: float) -> float:
+        return instrumentation.percentile(self.latencies, percentile)
+
+
+# The together package takes a while to import, so it's only imported once it's needed:
+# by the client factory, or here once a request has failed.
+
+
+def get_status_code(error: Exception) -> int | None:
+    import together
+
+    if isinstance(error, together.APIStatusError):
+        return error.status_code
+    return None
+
+
+def is_timeout(error: Exception) -> bool:
+    import together
+
+    return isinstance(error, together.APITimeoutError)
+
+
+def is_retryable(error: Exception) -> bool:
+    import together
+
+    if isinstance(error, (together.APIConnectionError, together.APITimeoutError)):
+        return True
+    return get_status_code(error) in RETRYABLE_STATUS_CODES
+
+
+def get_retry_after(error: Exception) -> float | None:
+    """Return how long the server asked us to wait before retrying, if it did."""
+    import together
+
+    if not isinstance(error, together.APIStatusError):
+        return None
+    headers = error.response.headers
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after is None:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        retry_date = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_date.timestamp() - time.time())
+
+
+def get_backoff_delay(attempt: int, error: Exception) -> float:
+    """Return a jittered exponential backoff delay, honoring Retry-After."""
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt))
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class ModelClient:
+    """Wraps the Together client with retries and adaptive concurrency per model.
+
+    The client is created by create_client on the first request, so importing and
+    constructing a ModelClient is cheap.
+    """
+
+    def __init__(
+        self,
+        create_client: Callable[[], Any],
+        concurrency: dict[str, int],
+        prices: dict[str, tuple[float, float]] | None = None,
+    ):
+        self.create_client = create_client
+        self.client = None
+        self.concurrency = concurrency
+        self.prices = prices or {}
+        self.limiters: dict[str, AdaptiveLimiter] = {}
+        self.stats: dict[str, ModelStats] = {}
+
+    def get_client(self) -> Any:
+        if self.client is None:
+            self.client = self.create_client()
+        return self.client
+
+    async def chat(self, model: str, messages: list[dict[str, str]]) -> Any:
+        """Return a chat completion."""
+        return await self._call(
+            model,
+            lambda: self.get_client().chat.completions.create(
+                model=model, messages=messages
+            ),
+        )
+
+    async def embed(self, model: str, texts: list[str]) -> list[list[float]]:
+        """Return the embeddings for a list of strings."""
+        response = await self._call(
+            model,
+            lambda: self.get_client().embeddings.create(input=texts, model=model),
+        )
+        return [result.embedding for result in response.data]
+
+    async def _call(self, model: str, request: Callable[[], Awaitable[Any]]) -> Any:
+        if model not in self.limiters:
+            self.limiters[model] = AdaptiveLimiter(self.concurrency.get(model, 4))
+            self.stats[model] = ModelStats()
+        limiter = self.limiters[model]
+        stats = self.stats[model]
+
+        stats.calls += 1
+        attempt = 0
+        while True:
+            await limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = await request()
+            except Exception as e:
+                error = e
+                latency = time.monotonic() - start
+                error_name = type(error).__name__
+                stats.errors[error_name] = stats.errors.get(error_name, 0) + 1
+                if get_status_code(error) in THROTTLED_STATUS_CODES or is_timeout(
+                    error
+                ):
+                    limiter.on_throttled(latency)
+
+                if not is_retryable(error) or attempt >= MAX_RETRIES:
+                    stats.failures += 1
+                    raise
+            else:
+                stats.latencies.append(time.monotonic() - start)
+                stats.record_usage(response)
+                limiter.on_success()
+                return response
+            finally:
+                await limiter.release()
+
+            if attempt == 0:
+                stats.retried_calls += 1
+            stats.retries += 1
+            await asyncio.sleep(get_backoff_delay(attempt, error))
+            attempt += 1
+
+    def report(self) -> str:
+        """Return a human readable summary of requests made to each model."""
+        lines = ["Model requests"]
+        for model, stats in sorted(self.stats.items()):
+            limiter = self.limiters[model]
+            lines.append(
+                f"  {model}: {stats.calls} calls, {stats.retried_calls} retried ({stats.retries} retries), "
+                f"{stats.failures} failed, {stats.error_rate():.1%} error rate, "
+                f"p50 {stats.latency_percentile(0.5):.2f}s, p95 {stats.latency_percentile(0.95):.2f}s, "
+                f"{stats.prompt_tokens} prompt and {stats.completion_tokens} completion tokens, "
+                f"concurrency {int(limiter.limit)}/{limiter.max_limit} ({limiter.decreases} decreases)"
+            )
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        """Return the requests, latencies, token usage and cost of each model for the run report."""
+        models = {}
+        for model, stats in sorted(self.stats.items()):
+            limiter = self.limiters[model]
+            models[model] = {
+                "calls": stats.calls,
+                "retried_calls": stats.retried_calls,
+                "retries": stats.retries,
+                "failures": stats.failures,
+                "errors": stats.errors,
+                "error_rate": stats.error_rate(),
+                "latency": instrumentation.get_histogram(stats.latencies),
+                "prompt_tokens": stats.prompt_tokens,
+                "completion_tokens": stats.completion_tokens,
+                "cost_usd": stats.get_cost(self.prices.get(model)),
+                "concurrency": {
+                    "limit": int(limiter.limit),
+                    "max_limit": limiter.max_limit,
+                    "decreases": limiter.decreases,
+                },
+            }
+        return models
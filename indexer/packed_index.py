@@ -0,0 +1,153 @@
+import json
+import struct  # for the fixed size file preamble
+
+import numpy as np
+
+MAGIC = b"RDAIIDX1"
+ALIGNMENT = 64
+STRING_FIELDS = ("title", "type", "content")
+
+
+def align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_sections(path: str, header: dict, arrays: dict[str, np.ndarray]):
+    """Write named arrays to a file that can be memory-mapped section by section.
+
+    Layout: MAGIC, a little-endian uint32 header length, a JSON header, then each
+    array as raw little-endian bytes aligned to ALIGNMENT bytes. The header records
+    the dtype, shape and offset of every array under "sections".
+    """
+    arrays = {
+        name: np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        for name, array in arrays.items()
+    }
+
+    # The offsets depend on the header length, which depends on the offsets,
+    # so reserve generous space for the numbers first and then fill them in
+    sections = {
+        name: {"dtype": array.dtype.str, "shape": list(array.shape), "offset": 0}
+        for name, array in arrays.items()
+    }
+    header = dict(header, sections=sections)
+    reserved = len(json.dumps(header).encode("utf-8")) + 20 * len(arrays)
+    offset = align(len(MAGIC) + 4 + reserved)
+    for name, array in arrays.items():
+        sections[name]["offset"] = offset
+        offset = align(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode("utf-8").ljust(reserved)
+
+    print(f"Writing {path}")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(b"\0" * (sections[name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+
+
+def read_sections(path: str) -> tuple[dict, dict[str, np.ndarray]]:
+    """Return the header and zero-copy memory maps of every array in a file written by write_sections."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a packed index")
+        (header_length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_length).decode("utf-8"))
+
+    arrays = {}
+    for name, section in header["sections"].items():
+        shape = tuple(section["shape"])
+        if 0 in shape:
+            arrays[name] = np.zeros(shape, dtype=section["dtype"])
+            continue
+        arrays[name] = np.memmap(
+            path,
+            dtype=section["dtype"],
+            mode="r",
+            offset=section["offset"],
+            shape=shape,
+        )
+    return header, arrays
+
+
+def pack_strings(
+    index: list[dict], fields: tuple[str, ...] = STRING_FIELDS
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return a UTF-8 string table of the fields of every entry, with field i of entry d at index d * len(fields) + i."""
+    encoded = [
+        str(entry.get(field, "")).encode("utf-8") for entry in index for field in fields
+    ]
+    string_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in encoded], out=string_offsets[1:])
+    strings = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return strings, string_offsets
+
+
+def pack_index(
+    index: list[dict], dtype: str = "float32"
+) -> tuple[dict, dict[str, np.ndarray]]:
+    """Convert index entries into the arrays of a packed index.
+
+    Embeddings become one contiguous matrix, with row_offsets[i]:row_offsets[i + 1]
+    being the rows of document i. The title, type and content of every document go
+    into a UTF-8 string table, with string i of document d at index d * 3 + i.
+    """
+    row_counts = [len(entry.get("embeddings", [])) for entry in index]
+    row_offsets = np.zeros(len(index) + 1, dtype=np.int64)
+    np.cumsum(row_counts, out=row_offsets[1:])
+
+    dimensions = next(
+        (len(entry["embeddings"][0]) for entry in index if entry.get("embeddings")), 0
+    )
+    embeddings = np.zeros((int(row_offsets[-1]), dimensions), dtype=dtype)
+    for i, entry in enumerate(index):
+        if row_counts[i] > 0:
+            embeddings[row_offsets[i] : row_offsets[i + 1]] = entry["embeddings"]
+
+    strings, string_offsets = pack_strings(index)
+
+    header = {
+        "documents": len(index),
+        "rows": int(row_offsets[-1]),
+        "dimensions": dimensions,
+        "dtype": dtype,
+        "string_fields": list(STRING_FIELDS),
+    }
+    arrays = {
+        "embeddings": embeddings,
+        "row_offsets": row_offsets,
+        "strings": strings,
+        "string_offsets": string_offsets,
+    }
+    return header, arrays
+
+
+class PackedIndex:
+    """A memory-mapped packed index. Nothing is read from disk until it is accessed."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header, self.arrays = read_sections(path)
+        self.fields = tuple(self.header.get("string_fields", STRING_FIELDS))
+        self.embeddings = self.arrays["embeddings"]
+        self.row_offsets = self.arrays["row_offsets"]
+
+    def __len__(self) -> int:
+        return self.header["documents"]
+
+    def get_string(self, document: int, field: str) -> str:
+        i = document * len(self.fields) + self.fields.index(field)
+        start, end = self.arrays["string_offsets"][i : i + 2]
+        return bytes(self.arrays["strings"][start:end]).decode("utf-8")
+
+    def get_document(self, document: int) -> dict[str, str]:
+        """Return the strings of a document: its title, type and content in a full index."""
+        return {field: self.get_string(document, field) for field in self.fields}
+
+    def get_embeddings(self, document: int) -> np.ndarray:
+        """Return the embedding rows of a document."""
+        start, end = self.row_offsets[document : document + 2]
+        return self.embeddings[start:end]
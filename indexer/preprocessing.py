@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import backends
+import chunking
+import creator_docs
+from config import EMBEDDING_TOKEN_LIMIT
+
+# Loaded once per process by get_tokenizer, and shared by everything in it
+tokenizer = None
+
+
+class PreparedDocument(NamedTuple):
+    title: str
+    content: str
+    # Ready to embed: lowercased and split to the embedding token limit
+    texts: list[str]
+    # Seconds the worker spent preparing the document
+    seconds: float
+
+
+def get_tokenizer():
+    """Return the embedding model's tokenizer, loading it on first use."""
+    global tokenizer
+    if tokenizer is None:
+        tokenizer = backends.load_tokenizer()
+    return tokenizer
+
+
+def init_worker():
+    get_tokenizer()
+
+
+def create_pool() -> ProcessPoolExecutor:
+    """Return a process pool for preprocessing, with a worker for every CPU.
+
+    Workers are started from a fresh server process rather than forked from the
+    indexer, which by then has threads running (source downloads and the event loop's
+    default executor) that forked workers would inherit mid-operation. init_worker sets up everything a worker needs.
+    """
+    return ProcessPoolExecutor(
+        max_workers=os.cpu_count(),
+        mp_context=multiprocessing.get_context("forkserver"),
+        initializer=init_worker,
+    )
+
+
+def split_texts(texts: list[str]) -> list[str]:
+    """Split up any strings that are over the embedding token limit."""
+    processed_texts = []
+    for text in texts:
+        text = text.replace("\n", " ")
+        processed_texts.extend(
+            chunking.split_text(text, get_tokenizer(), EMBEDDING_TOKEN_LIMIT)
+        )
+    return processed_texts
+
+
+def prepare_document(key: str, document: str) -> PreparedDocument:
+    """Parse and normalize a document, and return its title, cleaned content and embeddable texts."""
+    start = time.process_time()
+    embeddings_batch = []
+    metadata = creator_docs.get_document_metadata(filepath=key, document=document)
+    file_name = os.path.basename(key).replace(".md", "").replace(".yaml", "")
+    content = creator_docs.prepare_document_for_ingest(document=document)
+    lower_content = content.lower()
+
+    embeddings_batch.append(lower_content)
+
+    # Then, we break it into sections using ## headers, so that we get a dict of header content -> section content
+    sections = creator_docs.get_document_sections(
+        content=lower_content, metadata=metadata
+    )
+
+    for header in sections:
+        section_content = sections[header]
+
+        embeddable_content = (
+            "# "
+            + metadata.get("title", file_name)
+            + "\n## "
+            + metadata.get("description", "")
+            + "\n### "
+            + header
+            + "\n"
+            + section_content
+        )
+        embeddings_batch.append(embeddable_content.lower())
+
+    return PreparedDocument(
+        title=metadata.get("title", file_name),
+        content=content,
+        texts=split_texts(embeddings_batch),
+        seconds=time.process_time() - start,
+    )
@@ -0,0 +1,260 @@
+import time
+
+import numpy as np
+from search import DEFAULT_RELEVANCE_THRESHOLD, SearchIndex, sample_queries
+
+# Documents scored exactly in the first step. Each later step scores twice as many,
+# so the cutoff is tightened often early on without many steps overall.
+PRUNE_BLOCK_SIZE = 64
+# When more than this fraction of documents would still have to be scored after the
+# first block, scoring them all with one matrix product is cheaper than gathering their rows
+FULL_SCAN_FRACTION = 0.5
+# Rows processed at once while computing radii
+BOUNDS_BLOCK_SIZE = 4096
+# Largest relevance difference between bounded and exact search treated as the same
+# score, since they sum the float32 products in a different order
+SCORE_TOLERANCE = 1e-5
+
+
+def build_bounds(
+    embeddings: np.ndarray, row_offsets: np.ndarray
+) -> dict[str, np.ndarray]:
+    """Compute a cone covering every document's embedding rows.
+
+    A document's cone has a unit centroid direction c, the cosine of the largest
+    angle between c and any of its rows, and the largest row norm. A row can be no
+    closer in angle to the query than the query's angle to c minus that largest
+    angle, which bounds the document's relevance from above.
+
+    Returns the arrays to store alongside the index, one row per document with
+    embeddings, in the same order as SearchIndex.segment_documents.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    row_offsets = np.asarray(row_offsets, dtype=np.int64)
+    row_counts = np.diff(row_offsets)
+    segment_starts = row_offsets[:-1][row_counts > 0]
+    row_segments = np.repeat(np.arange(len(segment_starts)), row_counts[row_counts > 0])
+
+    row_norms = np.linalg.norm(embeddings, axis=1)
+    unit_rows = embeddings / np.maximum(row_norms, 1e-12)[:, None]
+    centroids = np.add.reduceat(unit_rows, segment_starts, axis=0)
+    centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+    cosines = np.empty(len(embeddings), dtype=np.float32)
+    for i in range(0, len(embeddings), BOUNDS_BLOCK_SIZE):
+        block = unit_rows[i : i + BOUNDS_BLOCK_SIZE]
+        cosines[i : i + len(block)] = np.einsum(
+            "ij,ij->i", block, centroids[row_segments[i : i + len(block)]]
+        )
+
+    # Widen the cones slightly so float32 rounding can never make a bound smaller than an actual score
+    return {
+        "document_centroids": centroids.astype(np.float32),
+        "document_cosines": np.clip(
+            np.minimum.reduceat(cosines, segment_starts) - 1e-4, -1, 1
+        ).astype(np.float32),
+        "document_norms": (
+            np.maximum.reduceat(row_norms, segment_starts) * (1 + 1e-5)
+        ).astype(np.float32),
+    }
+
+
+class BoundedSearchIndex:
+    """Exact search that skips documents whose relevance bound is below the current cutoff.
+
+    Documents are visited in order of their upper bound from build_bounds. Each
+    block is scored exactly, and the cutoff is raised to the k-th best relevance
+    found so far, or the threshold if that is higher. Once the next document's
+    bound is below the cutoff, no remaining document can make the top k.
+    """
+
+    def __init__(
+        self,
+        index: SearchIndex,
+        centroids: np.ndarray,
+        cosines: np.ndarray,
+        norms: np.ndarray,
+    ):
+        self.index = index
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.cosines = np.asarray(cosines, dtype=np.float32)
+        self.sines = np.sqrt(1 - self.cosines**2)
+        self.norms = np.asarray(norms, dtype=np.float32)
+
+    @classmethod
+    def from_arrays(cls, index: SearchIndex, arrays: dict[str, np.ndarray]):
+        return cls(
+            index,
+            arrays["document_centroids"],
+            arrays["document_cosines"],
+            arrays["document_norms"],
+        )
+
+    def bounds(self, query_vector: np.ndarray) -> np.ndarray:
+        """Return an upper bound on the relevance of every document for a query."""
+        query_norm = np.linalg.norm(query_vector)
+        query_cosines = np.clip(
+            self.centroids @ query_vector / max(query_norm, 1e-12), -1, 1
+        )
+        # cos(a - b) for the query's angle a to the centroid and the cone's angle b,
+        # or 1 if the query is inside the cone
+        cosines = (
+            query_cosines * self.cosines + np.sqrt(1 - query_cosines**2) * self.sines
+        )
+        cosines[query_cosines >= self.cosines] = 1
+        # A negative cosine is largest for the shortest row, so don't bound below 0
+        return query_norm * self.norms * np.maximum(cosines, 0)
+
+    def search_ids(
+        self, query_vector: np.ndarray, k: int, threshold: float
+    ) -> tuple[list[tuple[int, float]], int]:
+        """Return (document, relevance) of the k best documents, best first, and the number of documents pruned.
+
+        The documents with the highest bounds are scored first. If that cutoff can't
+        rule out most of the rest, everything is scored with one matrix product
+        instead, which is cheaper than sorting the bounds and gathering rows.
+        """
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        bounds = self.bounds(query_vector)
+        document_scores = np.full(len(bounds), -np.inf, dtype=np.float32)
+
+        def score(segments: np.ndarray) -> np.ndarray:
+            rows, offsets = self.index.segment_rows(segments)
+            scores = np.maximum.reduceat(
+                np.asarray(self.index.embeddings[rows], dtype=np.float32)
+                @ query_vector,
+                offsets,
+            )
+            document_scores[segments] = scores
+            return scores
+
+        block_size = max(PRUNE_BLOCK_SIZE, k)
+        if len(bounds) > block_size:
+            segments = np.argpartition(-bounds, block_size - 1)[:block_size]
+        else:
+            segments = np.arange(len(bounds))
+        best = score(segments)
+        scored = len(segments)
+        cutoff = threshold
+        if len(best) >= k:
+            best = np.partition(best, len(best) - k)[len(best) - k :]
+            cutoff = max(threshold, float(best[0]))
+
+        remaining = np.flatnonzero(bounds >= cutoff)
+        remaining = remaining[np.isneginf(document_scores[remaining])]
+        if len(remaining) > FULL_SCAN_FRACTION * len(bounds):
+            scores = self.index.score_documents(query_vector)
+            return self.index.top_k(scores, k, threshold), 0
+
+        order = remaining[np.argsort(-bounds[remaining], kind="stable")]
+        sorted_bounds = bounds[order]
+        start = 0
+        block_size *= 2
+        while start < len(order):
+            # Bounds are sorted, so everything past the first bound below the cutoff is pruned
+            end = int(np.searchsorted(-sorted_bounds, -cutoff, "right"))
+            if end <= start:
+                break
+
+            segments = order[start : min(start + block_size, end)]
+            start += len(segments)
+            block_size *= 2
+            scored += len(segments)
+
+            best = np.concatenate([best, score(segments)])
+            if len(best) >= k:
+                best = np.partition(best, len(best) - k)[len(best) - k :]
+                cutoff = max(threshold, float(best[0]))
+
+        return self.index.top_k(document_scores, k, threshold), len(bounds) - scored
+
+    def search(
+        self,
+        query_vector: list[float] | np.ndarray,
+        k: int = 2,
+        threshold: float = DEFAULT_RELEVANCE_THRESHOLD,
+    ) -> list[dict]:
+        """Return the k most relevant documents, as title, type, content and relevance."""
+        k = max(k, 1)
+        results, _ = self.search_ids(
+            self.index.project_queries(query_vector), k, threshold
+        )
+        return [
+            dict(self.index.get_document(document), relevance=relevance)
+            for document, relevance in results
+        ]
+
+
+def load_packed(path: str = "build/index.bin") -> BoundedSearchIndex:
+    """Load the bounded search index stored in an index.bin built with PRUNING_BOUNDS, memory-mapping everything."""
+    index = SearchIndex.from_packed(path)
+    return BoundedSearchIndex.from_arrays(index, index.arrays)
+
+
+def same_scores(
+    results: list[tuple[int, float]], truth: list[tuple[int, float]]
+) -> bool:
+    """Return whether two searches found results with the same relevances, best first.
+
+    Documents aren't compared, since bounded and exact search compute scores in a
+    different order and can rank documents with (nearly) tied scores either way.
+    """
+    return len(results) == len(truth) and np.allclose(
+        [relevance for _, relevance in results],
+        [relevance for _, relevance in truth],
+        rtol=0,
+        atol=SCORE_TOLERANCE,
+    )
+
+
+def pruning_report(
+    index: SearchIndex,
+    bounded: BoundedSearchIndex,
+    k: int = 10,
+    thresholds: tuple[float, ...] = (-1.0, DEFAULT_RELEVANCE_THRESHOLD),
+    queries: int = 200,
+    seed: int = 0,
+) -> dict:
+    """Measure how many documents bounded search prunes per query, and its latency against exact search.
+
+    Queries are perturbed copies of the index's own embedding rows (see
+    sample_queries). Results are also checked against exact search, since pruning
+    must never change them.
+    """
+    query_vectors = sample_queries(index.embeddings, queries, seed)
+
+    report = {
+        "k": k,
+        "queries": len(query_vectors),
+        "documents": len(index.segment_documents),
+        "thresholds": [],
+    }
+    for threshold in thresholds:
+        start = time.perf_counter()
+        exact = [
+            index.top_k(index.score_documents(query), k, threshold)
+            for query in query_vectors
+        ]
+        exact_latency = (time.perf_counter() - start) / len(query_vectors)
+
+        start = time.perf_counter()
+        found = [bounded.search_ids(query, k, threshold) for query in query_vectors]
+        latency = (time.perf_counter() - start) / len(query_vectors)
+
+        pruned = np.array([count for _, count in found])
+        report["thresholds"].append(
+            {
+                "threshold": threshold,
+                "pruned_mean": float(pruned.mean()),
+                "pruned_min": int(pruned.min()),
+                "pruned_max": int(pruned.max()),
+                "pruned_fraction": float(pruned.mean() / max(report["documents"], 1)),
+                "exact_latency_ms": exact_latency * 1000,
+                "latency_ms": latency * 1000,
+                "matches_exact": all(
+                    same_scores(results, truth)
+                    for (results, _), truth in zip(found, exact)
+                ),
+            }
+        )
+    return report
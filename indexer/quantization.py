@@ -0,0 +1,204 @@
+import time
+
+import numpy as np
+from config import QUANTIZATION_RERANK
+from search import DEFAULT_RELEVANCE_THRESHOLD, SearchIndex, sample_queries
+
+# Rows converted to float32 per matrix product. Small enough for the converted block to
+# stay in L2 cache, which makes int8 scoring about as fast as a float32 matmul while the
+# full matrix is only ever read at its quantized size.
+SCORE_BLOCK_SIZE = 256
+
+
+def quantize_int8(
+    embeddings: np.ndarray, scales: str = "row"
+) -> tuple[np.ndarray, np.ndarray]:
+    """Scalar-quantize embeddings to int8, with one scale per row or per dimension.
+
+    Returns the int8 matrix and the float32 scales, where embeddings ~= matrix * scales.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    axis = 1 if scales == "row" else 0
+    scale = np.abs(embeddings).max(axis=axis, keepdims=True) / 127
+    scale[scale == 0] = 1
+    quantized = np.clip(np.rint(embeddings / scale), -127, 127).astype(np.int8)
+    return quantized, scale.reshape(-1).astype(np.float32)
+
+
+def build_quantized(embeddings: np.ndarray, scales: str) -> dict[str, np.ndarray]:
+    """Return the int8 copy of the embedding matrix and its scales, to store alongside the index."""
+    quantized, scale = quantize_int8(embeddings, scales)
+    return {"embeddings_int8": quantized, "int8_scales": scale}
+
+
+class QuantizedSearchIndex:
+    """Search that scores every document on the int8 matrix, then re-ranks the best
+    candidates exactly with the full precision rows of only those documents.
+
+    Per-dimension scales are folded into the query, per-row scales are applied to
+    the row scores. float16 isn't scored this way, since converting it to float32
+    on every query is several times slower than exact search. It's only a storage
+    format, see PACKED_INDEX_DTYPE.
+    """
+
+    def __init__(
+        self,
+        index: SearchIndex,
+        matrix: np.ndarray,
+        scales: np.ndarray | None = None,
+        scale_mode: str = "row",
+    ):
+        if scale_mode not in ("row", "dimension"):
+            raise ValueError(f"Unknown int8 scale mode {scale_mode!r}")
+        expected = len(matrix) if scale_mode == "row" else matrix.shape[1]
+        if scales is not None and len(scales) != expected:
+            raise ValueError(
+                f"Expected {expected} per-{scale_mode} scales, got {len(scales)}"
+            )
+        self.index = index
+        self.matrix = matrix
+        self.scales = scales
+        self.scale_mode = scale_mode
+
+    @classmethod
+    def from_arrays(
+        cls, index: SearchIndex, arrays: dict[str, np.ndarray], scale_mode: str
+    ):
+        """Load the quantized arrays, with the scale mode recorded in the header's quantization.int8_scales."""
+        return cls(index, arrays["embeddings_int8"], arrays["int8_scales"], scale_mode)
+
+    def score_rows(self, query_vector: np.ndarray) -> np.ndarray:
+        """Return the approximate score of every row."""
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        if self.scales is not None and self.scale_mode == "dimension":
+            query_vector = query_vector * self.scales
+
+        scores = np.empty(len(self.matrix), dtype=np.float32)
+        block = np.empty((SCORE_BLOCK_SIZE, self.matrix.shape[1]), dtype=np.float32)
+        for i in range(0, len(self.matrix), SCORE_BLOCK_SIZE):
+            rows = self.matrix[i : i + SCORE_BLOCK_SIZE]
+            np.copyto(block[: len(rows)], rows, casting="unsafe")
+            np.dot(block[: len(rows)], query_vector, out=scores[i : i + len(rows)])
+
+        if self.scales is not None and self.scale_mode == "row":
+            scores *= self.scales
+        return scores
+
+    def search_ids(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        threshold: float,
+        rerank: int = QUANTIZATION_RERANK,
+    ) -> list[tuple[int, float]]:
+        """Return (document, relevance) of the k best documents, best first, with exact relevances."""
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        approximate = np.maximum.reduceat(
+            self.score_rows(query_vector), self.index.segment_starts
+        )
+
+        # Threshold only after re-ranking, since approximate scores can be off either way
+        candidates = max(rerank, k)
+        if len(approximate) > candidates:
+            segments = np.argpartition(-approximate, candidates - 1)[:candidates]
+        else:
+            segments = np.arange(len(approximate))
+
+        rows, segment_offsets = self.index.segment_rows(segments)
+        exact = np.maximum.reduceat(
+            np.asarray(self.index.embeddings[rows], dtype=np.float32) @ query_vector,
+            segment_offsets,
+        )
+        document_scores = np.full(len(approximate), -np.inf, dtype=np.float32)
+        document_scores[segments] = exact
+        return self.index.top_k(document_scores, k, threshold)
+
+    def search(
+        self,
+        query_vector: list[float] | np.ndarray,
+        k: int = 2,
+        threshold: float = DEFAULT_RELEVANCE_THRESHOLD,
+        rerank: int = QUANTIZATION_RERANK,
+    ) -> list[dict]:
+        """Return the k most relevant documents, as title, type, content and relevance."""
+        k = max(k, 1)
+        return [
+            dict(self.index.get_document(document), relevance=relevance)
+            for document, relevance in self.search_ids(
+                self.index.project_queries(query_vector), k, threshold, rerank
+            )
+        ]
+
+
+def quantization_report(
+    index: SearchIndex,
+    arrays: dict[str, np.ndarray],
+    scale_mode: str,
+    k: int = 10,
+    queries: int = 200,
+    seed: int = 0,
+) -> dict:
+    """Measure memory, latency and recall@k of int8 search against exact float32 search.
+
+    arrays come from build_quantized with scale_mode as its scales. float16 is
+    measured as a storage format: exact search over embeddings stored as
+    float16 and converted to float32 once at load, so only its size and recall differ.
+
+    Queries are perturbed copies of the index's own embedding rows (see
+    sample_queries), and no threshold is applied, so recall reflects ranking only.
+    """
+    query_vectors = sample_queries(index.embeddings, queries, seed)
+
+    def measure(search_ids) -> tuple[list[set[int]], float]:
+        start = time.perf_counter()
+        results = [
+            {document for document, _ in search_ids(query)} for query in query_vectors
+        ]
+        return results, (time.perf_counter() - start) / len(query_vectors) * 1000
+
+    exact, exact_latency = measure(
+        lambda query: index.top_k(index.score_documents(query), k, -1.0)
+    )
+    report = {
+        "k": k,
+        "queries": len(query_vectors),
+        "float32": {
+            "bytes": int(index.embeddings.nbytes),
+            "latency_ms": exact_latency,
+            "recall": 1.0,
+        },
+    }
+
+    def get_recall(found: list[set[int]]) -> float:
+        return float(
+            np.mean(
+                [
+                    len(hits & truth) / max(len(truth), 1)
+                    for hits, truth in zip(found, exact)
+                ]
+            )
+        )
+
+    int8_bytes = arrays["embeddings_int8"].nbytes + arrays["int8_scales"].nbytes
+    quantized = QuantizedSearchIndex.from_arrays(index, arrays, scale_mode)
+    found, latency = measure(lambda query: quantized.search_ids(query, k, -1.0))
+    report["int8"] = {
+        "bytes": int(int8_bytes),
+        "bytes_saved": int(index.embeddings.nbytes - int8_bytes),
+        "latency_ms": latency,
+        "speedup": exact_latency / latency,
+        "recall": get_recall(found),
+    }
+
+    float16 = SearchIndex(
+        index.embeddings.astype(np.float16), index.row_offsets, index.get_document
+    )
+    found, _ = measure(
+        lambda query: float16.top_k(float16.score_documents(query), k, -1.0)
+    )
+    report["float16"] = {
+        "bytes": int(index.embeddings.nbytes // 2),
+        "bytes_saved": int(index.embeddings.nbytes // 2),
+        "recall": get_recall(found),
+    }
+    return report
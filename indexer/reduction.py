@@ -0,0 +1,35 @@
+import numpy as np
+
+
+def fit_pca(embeddings: np.ndarray, dimensions: int) -> np.ndarray:
+    """Return a (dimensions, source dimensions) projection onto the top principal directions.
+
+    The directions come from the uncentered second moment matrix, so projecting
+    preserves dot products as well as possible rather than distances to the mean,
+    which keeps relevance scores comparable with the full embeddings.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    second_moment = embeddings.T @ embeddings
+    # eigh returns eigenvalues in ascending order
+    _, eigenvectors = np.linalg.eigh(second_moment)
+    return eigenvectors[:, ::-1][:, :dimensions].T.astype(np.float32)
+
+
+def truncation(source_dimensions: int, dimensions: int) -> np.ndarray:
+    """Return a projection that keeps the first dimensions, for Matryoshka embedding models."""
+    return np.eye(source_dimensions, dtype=np.float32)[:dimensions]
+
+
+def fit_projection(embeddings: np.ndarray, method: str, dimensions: int) -> np.ndarray:
+    if method == "pca":
+        return fit_pca(embeddings, dimensions)
+    if method == "truncate":
+        return truncation(embeddings.shape[1], dimensions)
+    raise ValueError(f"Unknown embedding reduction method {method!r}")
+
+
+def project(vectors: np.ndarray, projection: np.ndarray) -> np.ndarray:
+    """Project vectors and rescale them to unit length, so dot products stay cosine similarities."""
+    projected = np.asarray(vectors, dtype=np.float32) @ projection.T
+    norms = np.linalg.norm(projected, axis=-1, keepdims=True)
+    return projected / np.maximum(norms, 1e-12)
@@ -0,0 +1,259 @@
+import json
+
+import numpy as np
+import packed_index
+import reduction
+import shards
+from config import (
+    EMBEDDING_BATCH_LIMIT,
+    EMBEDDING_MODEL,
+    QUERY_INSTRUCTION,
+    TOGETHERAI_API_KEY,
+)
+
+# Same default as DocsAISearch.new in src/init.lua
+DEFAULT_RELEVANCE_THRESHOLD = 0.4
+# Queries scored per matrix product, to bound the size of the score matrix
+QUERY_BLOCK_SIZE = 256
+# Noise added to index rows sampled as report queries, relative to the row's norm
+QUERY_NOISE = 0.5
+
+
+def embed_queries(
+    queries: list[str], model: str = EMBEDDING_MODEL, client=None
+) -> np.ndarray:
+    """Return the embeddings of search queries, prepared the same way as DocsAISearch:Query.
+
+    Queries are embedded in as few requests as possible, EMBEDDING_BATCH_LIMIT at a time.
+    """
+    if client is None:
+        # Only needed when embedding queries, so don't make every search user import it
+        from together import Together
+
+        client = Together(api_key=TOGETHERAI_API_KEY)
+
+    inputs = [QUERY_INSTRUCTION + query.lower() for query in queries]
+    embeddings = []
+    for i in range(0, len(inputs), EMBEDDING_BATCH_LIMIT):
+        response = client.embeddings.create(
+            input=inputs[i : i + EMBEDDING_BATCH_LIMIT], model=model
+        )
+        embeddings.extend(result.embedding for result in response.data)
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def sample_queries(
+    embeddings: np.ndarray,
+    queries: int = 200,
+    seed: int = 0,
+    noise: float = QUERY_NOISE,
+) -> np.ndarray:
+    """Return query vectors for recall reports: random embedding rows moved in a random direction.
+
+    A row taken as is would be an exact match for itself, which inflates recall and
+    pruning. Perturbed rows keep their norm, like bench_search's queries.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.sort(
+        rng.choice(len(embeddings), min(queries, len(embeddings)), replace=False)
+    )
+    vectors = np.asarray(embeddings[rows], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    directions = rng.standard_normal(vectors.shape).astype(np.float32)
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    vectors = vectors + noise * norms * directions
+    return vectors * norms / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class SearchIndex:
+    """Exact KNN search over an index, with the same semantics as DocsAISearch:Query.
+
+    A document's relevance is the max dot product between the query and any of its
+    embeddings. All embeddings live in one matrix, so scoring a query is a single
+    matmul followed by a per-document max with np.maximum.reduceat.
+
+    If the embeddings were reduced with a projection, query vectors passed to the
+    search methods are projected the same way before scoring.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        row_offsets: np.ndarray,
+        get_document,
+        projection: np.ndarray | None = None,
+    ):
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.row_offsets = np.asarray(row_offsets, dtype=np.int64)
+        self.get_document = get_document
+        self.projection = projection
+        self.arrays: dict[str, np.ndarray] = {}
+
+        # reduceat can't express empty segments, so documents without embeddings are left out
+        row_counts = np.diff(self.row_offsets)
+        self.row_documents = np.repeat(np.arange(len(row_counts)), row_counts)
+        self.segment_documents = np.flatnonzero(row_counts > 0)
+        self.segment_starts = self.row_offsets[:-1][self.segment_documents]
+
+    @classmethod
+    def from_json(cls, path: str = "build/index.json") -> "SearchIndex":
+        """Load an index.json, decoding it fully into memory."""
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        _, arrays = packed_index.pack_index(index)
+
+        def get_document(document: int) -> dict[str, str]:
+            entry = index[document]
+            return {field: entry.get(field, "") for field in packed_index.STRING_FIELDS}
+
+        return cls(arrays["embeddings"], arrays["row_offsets"], get_document)
+
+    @classmethod
+    def from_packed(cls, path: str = "build/index.bin") -> "SearchIndex":
+        """Load an index.bin, memory-mapping it so content is only read for returned documents."""
+        index = packed_index.PackedIndex(path)
+        search_index = cls(
+            index.embeddings,
+            index.row_offsets,
+            index.get_document,
+            projection=index.arrays.get("projection"),
+        )
+        # Keep the other arrays around for the ANN and quantized search structures
+        search_index.arrays = index.arrays
+        return search_index
+
+    @classmethod
+    def from_shards(cls, location: str = "build") -> "SearchIndex":
+        """Load index-vectors.bin from a build directory or release URL, with content from its shards.
+
+        Only the shards of returned documents are downloaded and decompressed.
+        """
+        store = shards.ContentStore.open(location)
+        index = packed_index.PackedIndex(
+            store.get_path(store.manifest["vectors"]["file"])
+        )
+
+        def get_document(document: int) -> dict[str, str]:
+            return {
+                "title": index.get_string(document, "title"),
+                "type": index.get_string(document, "type"),
+                "content": store.get_content(document),
+            }
+
+        return cls(
+            index.embeddings,
+            index.row_offsets,
+            get_document,
+            projection=index.arrays.get("projection"),
+        )
+
+    def project_queries(self, query_vectors: np.ndarray) -> np.ndarray:
+        """Bring full size query vectors into the same space as the stored embeddings."""
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        if self.projection is None:
+            return query_vectors
+        return reduction.project(query_vectors, self.projection)
+
+    def __len__(self) -> int:
+        return len(self.row_offsets) - 1
+
+    def segment_rows(self, segments: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Return the embedding rows of the given segments, and where each segment starts in them.
+
+        The offsets can be passed to np.maximum.reduceat to get per-segment maxima.
+        """
+        starts = self.segment_starts[segments]
+        lengths = self.row_offsets[self.segment_documents[segments] + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        rows = (
+            np.arange(lengths.sum())
+            - np.repeat(offsets, lengths)
+            + np.repeat(starts, lengths)
+        )
+        return rows, offsets
+
+    def score_documents(self, query_vector: np.ndarray) -> np.ndarray:
+        """Return the relevance of every document that has embeddings, in segment order."""
+        scores = self.embeddings @ np.asarray(query_vector, dtype=np.float32)
+        return np.maximum.reduceat(scores, self.segment_starts)
+
+    def score_documents_batch(self, query_vectors: np.ndarray) -> np.ndarray:
+        """Return the relevance of every document with embeddings for each query, as (queries, segments)."""
+        scores = np.asarray(query_vectors, dtype=np.float32) @ self.embeddings.T
+        return np.maximum.reduceat(scores, self.segment_starts, axis=1)
+
+    def top_k(
+        self, document_scores: np.ndarray, k: int, threshold: float
+    ) -> list[tuple[int, float]]:
+        """Return (document, relevance) of the k best scores at or above threshold, best first.
+
+        Exact ties are broken by document order, so results are deterministic. Scores
+        computed another way (bounded, quantized or ANN search) can differ by rounding,
+        so their order among nearly tied documents may differ.
+        """
+        candidates = np.flatnonzero(document_scores >= threshold)
+        if len(candidates) > k:
+            scores = document_scores[candidates]
+            kth = np.partition(-scores, k - 1)[k - 1]
+            better = candidates[-scores < kth]
+            tied = candidates[-scores == kth][: k - len(better)]
+            candidates = np.sort(np.concatenate([better, tied]))
+        order = np.argsort(-document_scores[candidates], kind="stable")
+        return [
+            (int(self.segment_documents[i]), float(document_scores[i]))
+            for i in candidates[order]
+        ]
+
+    def search(
+        self,
+        query_vector: list[float] | np.ndarray,
+        k: int = 2,
+        threshold: float = DEFAULT_RELEVANCE_THRESHOLD,
+    ) -> list[dict]:
+        """Return the k most relevant documents, as title, type, content and relevance."""
+        k = max(k, 1)
+        document_scores = self.score_documents(self.project_queries(query_vector))
+        return [
+            dict(self.get_document(document), relevance=relevance)
+            for document, relevance in self.top_k(document_scores, k, threshold)
+        ]
+
+    def search_batch(
+        self,
+        query_vectors: list[list[float]] | np.ndarray,
+        k: int = 2,
+        threshold: float = DEFAULT_RELEVANCE_THRESHOLD,
+    ) -> list[list[dict]]:
+        """Return the k most relevant documents for each query vector.
+
+        Each block of queries is scored against the whole index with one matrix product.
+        """
+        k = max(k, 1)
+        query_vectors = self.project_queries(query_vectors)
+        results = []
+        for i in range(0, len(query_vectors), QUERY_BLOCK_SIZE):
+            block_scores = self.score_documents_batch(
+                query_vectors[i : i + QUERY_BLOCK_SIZE]
+            )
+            for document_scores in block_scores:
+                results.append(
+                    [
+                        dict(self.get_document(document), relevance=relevance)
+                        for document, relevance in self.top_k(
+                            document_scores, k, threshold
+                        )
+                    ]
+                )
+        return results
+
+    def query_batch(
+        self,
+        queries: list[str],
+        k: int = 2,
+        threshold: float = DEFAULT_RELEVANCE_THRESHOLD,
+        client=None,
+    ) -> list[list[dict]]:
+        """Embed search queries and return the k most relevant documents for each."""
+        if len(queries) == 0:
+            return []
+        return self.search_batch(embed_queries(queries, client=client), k, threshold)
@@ -0,0 +1,166 @@
+"""Sharded release artifacts, for clients that only load the content of the documents they return.
+
+index-vectors.bin is a packed index (see packed_index) with the embeddings and each
+document's key, title, type and hash (see delta), but no content. Content is split
+into gzip compressed JSON shards of CONTENT_SHARD_DOCUMENTS consecutive documents,
+so a document's shard follows from its id. content-manifest.json lists every
+artifact with its size and hash.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import packed_index
+import write
+from config import CONTENT_SHARD_DOCUMENTS
+
+VECTORS_FILE = "index-vectors.bin"
+MANIFEST_FILE = "content-manifest.json"
+CONTENT_DIR = "content"
+VECTOR_FIELDS = ("key", "title", "type", "hash")
+
+
+def compress(data: bytes) -> bytes:
+    # No timestamp, so unchanged content gives byte-identical shards
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def describe_file(path: str, file: str) -> dict:
+    with open(path, "rb") as f:
+        data = f.read()
+    return {
+        "file": file,
+        "bytes": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+
+
+def write_content_shards(
+    contents: list[str], directory: str, shard_documents: int
+) -> list[dict]:
+    """Write the content of every document to compressed shards and return their manifest entries."""
+    # Start from an empty directory so shards of a larger previous index aren't published
+    shutil.rmtree(os.path.join(directory, CONTENT_DIR), ignore_errors=True)
+    os.makedirs(os.path.join(directory, CONTENT_DIR))
+
+    shards = []
+    for first in range(0, len(contents), shard_documents):
+        file = f"{CONTENT_DIR}/content-{first // shard_documents:04d}.json.gz"
+        shard = contents[first : first + shard_documents]
+        data = compress(json.dumps(shard, ensure_ascii=False).encode("utf-8"))
+        with open(os.path.join(directory, file), "wb") as f:
+            f.write(data)
+        shards.append(
+            {
+                "file": file,
+                "first": first,
+                "count": len(shard),
+                "bytes": len(data),
+                "sha256": hashlib.sha256(data).hexdigest(),
+            }
+        )
+    return shards
+
+
+def write_artifacts(
+    entries: dict[str, dict],
+    hashes: list[str],
+    header: dict,
+    arrays: dict[str, np.ndarray],
+    directory: str = "build",
+    shard_documents: int = CONTENT_SHARD_DOCUMENTS,
+) -> dict:
+    """Write index-vectors.bin, the content shards and content-manifest.json, and return the manifest.
+
+    hashes are the entries' hashes, arrays their packed embeddings, row offsets and
+    optional projection, in order, and header the packed index header they came with.
+    """
+    keys = list(entries)
+    index = list(entries.values())
+    strings, string_offsets = packed_index.pack_strings(
+        [
+            dict(entry, key=key, hash=content_hash)
+            for (key, entry), content_hash in zip(entries.items(), hashes)
+        ],
+        VECTOR_FIELDS,
+    )
+    vector_arrays = {
+        name: arrays[name]
+        for name in ("embeddings", "row_offsets", "projection")
+        if name in arrays
+    }
+    vector_arrays.update(strings=strings, string_offsets=string_offsets)
+    packed_index.write_sections(
+        os.path.join(directory, VECTORS_FILE),
+        dict(header, string_fields=list(VECTOR_FIELDS)),
+        vector_arrays,
+    )
+
+    shards = write_content_shards(
+        [entry["content"] for entry in index], directory, shard_documents
+    )
+    manifest = {
+        "embedding_model": header.get("embedding_model"),
+        "index_version": header.get("index_version"),
+        "documents": len(keys),
+        "compression": "gzip",
+        "shard_documents": shard_documents,
+        "vectors": describe_file(os.path.join(directory, VECTORS_FILE), VECTORS_FILE),
+        "shards": shards,
+    }
+    write.write_json(manifest, os.path.join(directory, MANIFEST_FILE))
+    return manifest
+
+
+def is_url(location: str) -> bool:
+    return location.startswith(("http://", "https://"))
+
+
+class ContentStore:
+    """Document content from compressed shards, in a build directory or a release.
+
+    A shard is only read, or downloaded for a release URL, and decompressed the first
+    time one of its documents is asked for. Release assets are flat, so files are
+    fetched from a release by their base name.
+    """
+
+    def __init__(self, location: str, manifest: dict):
+        self.location = location
+        self.manifest = manifest
+        self.shards: dict[int, list[str]] = {}
+
+    @classmethod
+    def open(cls, location: str = "build") -> "ContentStore":
+        """Load the content manifest of a build directory or release download URL."""
+        store = cls(location, {})
+        with open(store.get_path(MANIFEST_FILE), "r", encoding="utf-8") as f:
+            store.manifest = json.load(f)
+        return store
+
+    def get_path(self, file: str) -> str:
+        """Return the local path of an artifact, downloading it first from a release."""
+        if not is_url(self.location):
+            return os.path.join(self.location, file)
+        import sources
+
+        name = file.rsplit("/", 1)[-1]
+        return sources.fetch(f"{self.location.rstrip('/')}/{name}", name=name)
+
+    def load_shard(self, shard: int) -> list[str]:
+        if shard not in self.shards:
+            info = self.manifest["shards"][shard]
+            with open(self.get_path(info["file"]), "rb") as f:
+                data = f.read()
+            if hashlib.sha256(data).hexdigest() != info["sha256"]:
+                raise ValueError(f"{info['file']} doesn't match the content manifest")
+            self.shards[shard] = json.loads(gzip.decompress(data))
+        return self.shards[shard]
+
+    def get_content(self, document: int) -> str:
+        shard_documents = self.manifest["shard_documents"]
+        shard = self.load_shard(document // shard_documents)
+        return shard[document % shard_documents]
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import shutil  # for streaming downloads to disk
+import threading
+
+import config
+
+HTTP_CACHE_DIR = "build/cache/http"
+
+# One pooled session for every source fetch, so connections to GitHub are reused.
+# Created on the first fetch, so modules that only parse sources don't import requests.
+session = None
+session_lock = threading.Lock()
+
+# Local copies already fetched this run, by URL
+fetched: dict[str, str] = {}
+fetched_lock = threading.Lock()
+url_locks: dict[str, threading.Lock] = {}
+
+
+def get_session():
+    global session
+    with session_lock:
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        return session
+
+
+def get_cache_paths(name: str) -> tuple[str, str]:
+    key = hashlib.sha256(name.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(HTTP_CACHE_DIR, key), os.path.join(
+        HTTP_CACHE_DIR, key + ".json"
+    )
+
+
+def get_fixture_path(name: str) -> str:
+    """Return the file in SOURCES_FIXTURES_DIR that stands in for a source, by the last part of its name."""
+    path = os.path.join(config.SOURCES_FIXTURES_DIR, name.rsplit("/", 1)[-1])
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"No fixture for {name} in {config.SOURCES_FIXTURES_DIR}"
+        )
+    return path
+
+
+def fetch(url: str, headers: dict | None = None, name: str | None = None) -> str:
+    """Download url to the HTTP cache and return the path of the local copy.
+
+    The ETag of the last download is sent as If-None-Match, so an unchanged source
+    returns 304 and the local copy is used. Each name keeps only its latest copy,
+    so sources pinned to a commit don't pile up; it defaults to the URL. A URL is
+    requested at most once per run, and bodies are streamed to disk.
+    With SOURCES_FIXTURES_DIR set, the fixture is returned instead.
+    """
+    if config.SOURCES_FIXTURES_DIR is not None:
+        return get_fixture_path(name or url)
+
+    with fetched_lock:
+        if url in fetched:
+            return fetched[url]
+        url_lock = url_locks.setdefault(url, threading.Lock())
+
+    with url_lock:
+        with fetched_lock:
+            if url in fetched:
+                return fetched[url]
+
+        body_path, meta_path = get_cache_paths(name or url)
+        request_headers = dict(headers or {})
+        if os.path.exists(body_path) and os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("url") == url and meta.get("etag"):
+                request_headers["If-None-Match"] = meta["etag"]
+
+        with get_session().get(url, headers=request_headers, stream=True) as res:
+            if res.status_code == 304:
+                print(f"Using cached {url}")
+            else:
+                res.raise_for_status()
+                os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+                res.raw.decode_content = True
+                with open(body_path + ".tmp", "wb") as f:
+                    shutil.copyfileobj(res.raw, f, 1024 * 1024)
+                os.replace(body_path + ".tmp", body_path)
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"url": url, "etag": res.headers.get("ETag")}, f)
+
+        with fetched_lock:
+            fetched[url] = body_path
+        return body_path
+
+
+def fetch_json(url: str, headers: dict | None = None, name: str | None = None):
+    with open(fetch(url, headers, name), "rb") as f:
+        return json.load(f)
+
+
+def fetch_text(url: str, headers: dict | None = None, name: str | None = None) -> str:
+    with open(fetch(url, headers, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def get_commit_sha(repo: str, ref: str) -> str:
+    """Return the commit SHA a branch of a GitHub repo currently points to."""
+    if config.SOURCES_FIXTURES_DIR is not None:
+        return "fixtures"
+    return fetch_text(
+        f"https://api.github.com/repos/{repo}/commits/{ref}",
+        headers=dict(config.GH_REQ_HEADERS, Accept="application/vnd.github.sha"),
+        name=f"{repo}@{ref}",
+    ).strip()
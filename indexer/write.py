@@ -7,6 +7,12 @@ def write_text(data: str, filename: str):
         f.write(data)
 
 
+def append_text(data: str, filename: str):
+    print(f"Appending to {filename}")
+    with open(filename, "a", encoding="utf-8") as f:
+        f.write(data)
+
+
 def write_json(data, filename: str):
     print(f"Writing {filename}")
     with open(filename, "w", encoding="utf-8") as f: